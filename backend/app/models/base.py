@@ -5,14 +5,51 @@
 遵循DRY原则，避免在每个模型中重复定义相同的字段。
 """
 
+import hashlib
+import os
+import re
 from datetime import datetime
 from sqlalchemy import Column, BigInteger, DateTime, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.types import NullType
+
+try:
+    import blake3
+except ImportError:  # blake3为可选依赖
+    blake3 = None
 
 # 创建基础模型类
 Base = declarative_base()
 
+# 驼峰命名转下划线命名的正则，模块加载时编译一次
+_CAMEL_WORD = re.compile(r'(.)([A-Z][a-z]+)')
+_CAMEL_TAIL = re.compile(r'([a-z0-9])([A-Z])')
+
+# 类名到表名的缓存
+_TABLENAME_CACHE = {}
+
+# 内容哈希算法，设置PM_HASH=blake3且安装了blake3时使用SIMD并行的blake3
+_hasher = blake3.blake3 if blake3 is not None and os.getenv('PM_HASH') == 'blake3' else hashlib.sha256
+
+
+def calculate_content_hash(content):
+    """
+    计算内容哈希值
+    
+    提示词和版本共用的哈希算法，用于版本对比和去重。
+    已经是字节串的内容直接参与计算，不再重复编码。
+    
+    Args:
+        content (str | bytes): 要计算哈希的内容
+        
+    Returns:
+        str: 64位十六进制的哈希值
+    """
+    if not isinstance(content, (bytes, bytearray, memoryview)):
+        content = content.encode('utf-8')
+    return _hasher(content).hexdigest()
+
 
 class BaseModel(Base):
     """
@@ -68,28 +105,72 @@ class BaseModel(Base):
         Returns:
             dict: 模型数据的字典表示
         """
-        if exclude_fields is None:
-            exclude_fields = []
-            
-        result = {}
+        serializer = self.__class__.__dict__.get('_to_dict_fast')
+        if serializer is None:
+            serializer = self.__class__._compile_to_dict()
         
-        # 遍历所有列，将值添加到字典中
-        for column in self.__table__.columns:
-            field_name = column.name
-            
-            # 跳过需要排除的字段
-            if field_name in exclude_fields:
-                continue
-                
-            field_value = getattr(self, field_name)
+        return serializer(self, frozenset(exclude_fields) if exclude_fields else frozenset())
+    
+    def __json__(self, exclude_fields=None):
+        """
+        将模型实例转换为供JSON序列化器使用的原始字典
+        
+        与to_dict不同，datetime值保持原样，交给orjson在C层格式化。
+        
+        Args:
+            exclude_fields (list): 需要排除的字段列表
             
-            # 处理datetime类型，转换为ISO格式字符串
-            if isinstance(field_value, datetime):
-                field_value = field_value.isoformat()
-                
-            result[field_name] = field_value
+        Returns:
+            dict: 未格式化datetime的模型数据字典
+        """
+        serializer = self.__class__.__dict__.get('_to_json_fast')
+        if serializer is None:
+            serializer = self.__class__._compile_to_dict(raw=True)
+        
+        return serializer(self, frozenset(exclude_fields) if exclude_fields else frozenset())
+    
+    @classmethod
+    def _compile_to_dict(cls, raw=False):
+        """
+        为模型类生成专用的序列化函数
+        
+        首次序列化时根据表结构生成一次并缓存在类上。
+        列清单、排除判断和datetime转换都展开为直线代码，
+        每次调用不再遍历列，也不再逐个判断值的类型。
+        
+        Args:
+            raw (bool): 为True时生成不转换datetime的版本，供__json__使用
+        
+        Returns:
+            function: 签名为 (instance, exclude) 的序列化函数
+        """
+        func_name = '_to_json_fast' if raw else '_to_dict_fast'
+        lines = [f'def {func_name}(self, exclude):', '    result = {}']
+        
+        for column in cls.__table__.columns:
+            name = column.name
+            lines.append(f'    if {name!r} not in exclude:')
+            lines.append(f'        value = self.{name}')
             
-        return result
+            if raw:
+                lines.append(f'        result[{name!r}] = value')
+            elif isinstance(column.type, DateTime):
+                # datetime列在生成时确定，运行时直接转换为ISO格式
+                lines.append(f'        result[{name!r}] = value.isoformat() if value is not None else None')
+            elif isinstance(column.type, NullType):
+                # 未声明类型的列仍需在运行时判断
+                lines.append(f'        result[{name!r}] = value.isoformat() if isinstance(value, datetime) else value')
+            else:
+                lines.append(f'        result[{name!r}] = value')
+        
+        lines.append('    return result')
+        
+        namespace = {'datetime': datetime}
+        exec('\n'.join(lines), namespace)
+        
+        serializer = namespace[func_name]
+        setattr(cls, func_name, serializer)
+        return serializer
     
     def update_from_dict(self, data, allowed_fields=None):
         """
@@ -102,17 +183,53 @@ class BaseModel(Base):
             allowed_fields (list): 允许更新的字段列表，None表示允许所有字段
         """
         if allowed_fields is None:
-            # 如果没有指定允许的字段，则获取所有列名
-            allowed_fields = [column.name for column in self.__table__.columns]
+            # 允许所有列时使用为模型类生成的专用函数
+            updater = self.__class__.__dict__.get('_update_fast')
+            if updater is None:
+                updater = self.__class__._compile_update_from_dict()
+            updater(self, data)
+            return
+        
+        allowed_fields = frozenset(allowed_fields)
         
         # 遍历数据字典，更新对应字段
         for field_name, field_value in data.items():
             # 检查字段是否存在且允许更新
-            if (hasattr(self, field_name) and 
-                field_name in allowed_fields and 
-                field_name != 'id'):  # 主键不允许更新
+            if (field_name in allowed_fields and 
+                field_name != 'id' and  # 主键不允许更新
+                hasattr(self, field_name)):
                 setattr(self, field_name, field_value)
     
+    @classmethod
+    def _compile_update_from_dict(cls):
+        """
+        为模型类生成专用的字段更新函数
+        
+        与_compile_to_dict相同，首次调用时生成一次并缓存在类上，
+        每个可更新的列展开为一次成员判断和一次属性赋值。
+        
+        Returns:
+            function: 签名为 (instance, data) 的更新函数
+        """
+        lines = ['def _update_fast(self, data):']
+        
+        for column in cls.__table__.columns:
+            name = column.name
+            # 主键不允许更新
+            if name == 'id':
+                continue
+            lines.append(f'    if {name!r} in data:')
+            lines.append(f'        self.{name} = data[{name!r}]')
+        
+        lines.append('    return None')
+        
+        namespace = {}
+        exec('\n'.join(lines), namespace)
+        
+        updater = namespace['_update_fast']
+        setattr(cls, '_update_fast', updater)
+        return updater
+    
     def __repr__(self):
         """
         模型的字符串表示
@@ -129,10 +246,16 @@ class BaseModel(Base):
         将类名转换为下划线命名的表名。
         例如：UserProfile -> user_profile
         """
-        import re
-        # 将驼峰命名转换为下划线命名
-        name = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', cls.__name__)
-        return re.sub('([a-z0-9])([A-Z])', r'\1_\2', name).lower()
+        class_name = cls.__name__
+        tablename = _TABLENAME_CACHE.get(class_name)
+        
+        if tablename is None:
+            # 将驼峰命名转换为下划线命名
+            name = _CAMEL_WORD.sub(r'\1_\2', class_name)
+            tablename = _CAMEL_TAIL.sub(r'\1_\2', name).lower()
+            _TABLENAME_CACHE[class_name] = tablename
+        
+        return tablename
 
 
 class TimestampMixin:
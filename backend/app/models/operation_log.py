@@ -5,9 +5,86 @@
 记录用户在系统中的重要操作，用于审计和问题追踪。
 """
 
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, JSON
+import csv
+import io
+import json
+from enum import IntEnum
+
+from sqlalchemy import Column, String, Text, Integer, SmallInteger, ForeignKey, JSON, Index, insert
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from .base import BaseModel
+from . import _log_writer
+
+
+class OperationType(IntEnum):
+    """操作类型枚举，数据库中存储为SMALLINT"""
+    
+    CREATE = 1
+    UPDATE = 2
+    DELETE = 3
+    VIEW = 4
+    LOGIN = 5
+    LOGOUT = 6
+    TEST = 7
+    
+    @property
+    def label(self):
+        """对外展示的名称，如CREATE"""
+        return self.name
+
+
+class ResourceType(IntEnum):
+    """资源类型枚举，数据库中存储为SMALLINT"""
+    
+    USER = 1
+    PROMPT = 2
+    TAG = 3
+    VERSION = 4
+    COLLABORATOR = 5
+    TEST = 6
+    
+    @property
+    def label(self):
+        """对外展示的名称，如prompt"""
+        return self.name.lower()
+
+
+def _to_enum(enum_class, value):
+    """
+    将字符串、整数或枚举统一转换为枚举成员
+    
+    兼容以字符串传入类型的旧调用方式，如'CREATE'、'prompt'。
+    """
+    if value is None or isinstance(value, enum_class):
+        return value
+    if isinstance(value, str):
+        return enum_class[value.upper()]
+    return enum_class(value)
+
+
+class IntEnumType(TypeDecorator):
+    """
+    IntEnum列类型
+    
+    写入时接受枚举、整数或名称字符串，统一存储为SMALLINT；
+    读取时还原为枚举成员。
+    """
+    
+    impl = SmallInteger
+    cache_ok = True
+    
+    def __init__(self, enum_class, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enum_class = enum_class
+    
+    def process_bind_param(self, value, dialect):
+        value = _to_enum(self.enum_class, value)
+        return None if value is None else int(value)
+    
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.enum_class(value)
 
 
 class OperationLog(BaseModel):
@@ -19,6 +96,17 @@ class OperationLog(BaseModel):
     """
     
     __tablename__ = 'operation_logs'
+    __table_args__ = (
+        # 审计查询：按用户查看操作记录、按资源追溯变更
+        Index('ix_ol_user_created', 'user_id', 'created_at'),
+        Index('ix_ol_resource', 'resource_type', 'resource_id'),
+        # PostgreSQL上为操作详情建GIN索引，其他数据库不创建
+        Index(
+            'ix_ol_detail_gin',
+            'operation_detail',
+            postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+    )
     
     # === 用户信息字段 ===
     user_id = Column(
@@ -30,15 +118,15 @@ class OperationLog(BaseModel):
     
     # === 操作信息字段 ===
     operation_type = Column(
-        String(50),
+        IntEnumType(OperationType),
         nullable=False,
-        comment='操作类型，如CREATE、UPDATE、DELETE等'
+        comment='操作类型，取值见OperationType，如1-CREATE、2-UPDATE、3-DELETE'
     )
     
     resource_type = Column(
-        String(50),
+        IntEnumType(ResourceType),
         nullable=False,
-        comment='资源类型，如prompt、user、tag等'
+        comment='资源类型，取值见ResourceType，如1-user、2-prompt、3-tag'
     )
     
     resource_id = Column(
@@ -47,8 +135,9 @@ class OperationLog(BaseModel):
         comment='资源ID，具体操作的资源标识'
     )
     
+    # PostgreSQL上使用JSONB，读取时无需重新解析文本，并支持GIN索引
     operation_detail = Column(
-        JSON,
+        JSON().with_variant(JSONB(), 'postgresql'),
         nullable=True,
         comment='操作详情，JSON格式存储具体的操作信息'
     )
@@ -73,21 +162,32 @@ class OperationLog(BaseModel):
     )
     
     # === 操作类型常量 ===
-    OPERATION_CREATE = 'CREATE'
-    OPERATION_UPDATE = 'UPDATE'
-    OPERATION_DELETE = 'DELETE'
-    OPERATION_VIEW = 'VIEW'
-    OPERATION_LOGIN = 'LOGIN'
-    OPERATION_LOGOUT = 'LOGOUT'
-    OPERATION_TEST = 'TEST'
+    OPERATION_CREATE = OperationType.CREATE
+    OPERATION_UPDATE = OperationType.UPDATE
+    OPERATION_DELETE = OperationType.DELETE
+    OPERATION_VIEW = OperationType.VIEW
+    OPERATION_LOGIN = OperationType.LOGIN
+    OPERATION_LOGOUT = OperationType.LOGOUT
+    OPERATION_TEST = OperationType.TEST
     
     # === 资源类型常量 ===
-    RESOURCE_USER = 'user'
-    RESOURCE_PROMPT = 'prompt'
-    RESOURCE_TAG = 'tag'
-    RESOURCE_VERSION = 'version'
-    RESOURCE_COLLABORATOR = 'collaborator'
-    RESOURCE_TEST = 'test'
+    RESOURCE_USER = ResourceType.USER
+    RESOURCE_PROMPT = ResourceType.PROMPT
+    RESOURCE_TAG = ResourceType.TAG
+    RESOURCE_VERSION = ResourceType.VERSION
+    RESOURCE_COLLABORATOR = ResourceType.COLLABORATOR
+    RESOURCE_TEST = ResourceType.TEST
+    
+    # === 批量写入配置 ===
+    # 超过该行数时在PostgreSQL上改用COPY写入
+    COPY_THRESHOLD = 100
+    
+    # COPY写入时使用的固定列顺序
+    COPY_COLUMNS = (
+        'user_id', 'operation_type', 'resource_type', 'resource_id',
+        'operation_detail', 'ip_address', 'user_agent',
+        'created_at', 'updated_at'
+    )
     
     # === 便捷创建方法 ===
     @classmethod
@@ -97,26 +197,107 @@ class OperationLog(BaseModel):
         """
         创建操作日志
         
+        日志不会立即写入数据库，而是放入后台写入队列，
+        由写入线程按批次合并提交。类型在入队前转换为枚举，
+        无效的类型名在调用方立即报错，不会进入批次影响其他日志。
+        
         Args:
             user_id (int): 用户ID
-            operation_type (str): 操作类型
-            resource_type (str): 资源类型
+            operation_type (OperationType | str): 操作类型，也可传名称如'CREATE'
+            resource_type (ResourceType | str): 资源类型，也可传名称如'prompt'
             resource_id (int): 资源ID
             operation_detail (dict): 操作详情
             ip_address (str): IP地址
             user_agent (str): 用户代理
             
         Returns:
-            OperationLog: 日志实例
+            object: 入队标记 _log_writer.QUEUED
+            
+        Raises:
+            KeyError: 类型名称无效
+            ValueError: 类型值无效
+        """
+        return _log_writer.enqueue({
+            'user_id': user_id,
+            'operation_type': _to_enum(OperationType, operation_type),
+            'resource_type': _to_enum(ResourceType, resource_type),
+            'resource_id': resource_id,
+            'operation_detail': operation_detail,
+            'ip_address': ip_address,
+            'user_agent': user_agent
+        })
+    
+    @classmethod
+    def bulk_create_logs(cls, session, rows):
+        """
+        批量写入操作日志
+        
+        跳过ORM实例的创建，一次往返写入整批日志。
+        默认使用executemany插入，PostgreSQL上大批量数据改用COPY。
+        调用方负责提交事务。
+        
+        Args:
+            session: 数据库会话
+            rows (list): 日志字典列表，键与create_log的参数一致
+            
+        Returns:
+            int: 写入的日志数量
+        """
+        if not rows:
+            return 0
+        
+        if (len(rows) > cls.COPY_THRESHOLD and
+                session.get_bind().dialect.name == 'postgresql'):
+            cursor = session.connection().connection.cursor()
+            try:
+                if hasattr(cursor, 'copy_expert'):
+                    cls._copy_rows(cursor, rows)
+                    return len(rows)
+            finally:
+                cursor.close()
+        
+        session.execute(insert(cls), rows)
+        return len(rows)
+    
+    @classmethod
+    def _copy_rows(cls, cursor, rows):
         """
-        return cls(
-            user_id=user_id,
-            operation_type=operation_type,
-            resource_type=resource_type,
-            resource_id=resource_id,
-            operation_detail=operation_detail,
-            ip_address=ip_address,
-            user_agent=user_agent
+        使用COPY FROM STDIN写入日志（仅PostgreSQL/psycopg2）
+        
+        时间戳列没有服务端默认值，COPY时必须显式写入；
+        这里取数据库的LOCALTIMESTAMP，与小批量INSERT使用的列默认值current_timestamp
+        来自同一个时钟，日志时间不受批次大小影响。
+        
+        Args:
+            cursor: DBAPI游标
+            rows (list): 日志字典列表
+        """
+        cursor.execute("SELECT LOCALTIMESTAMP")
+        now = cursor.fetchone()[0]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        for row in rows:
+            detail = row.get('operation_detail')
+            values = (
+                row.get('user_id'),
+                int(_to_enum(OperationType, row['operation_type'])),
+                int(_to_enum(ResourceType, row['resource_type'])),
+                row.get('resource_id'),
+                json.dumps(detail, ensure_ascii=False) if detail is not None else None,
+                row.get('ip_address'),
+                row.get('user_agent'),
+                (row.get('created_at') or now).isoformat(),
+                (row.get('updated_at') or now).isoformat()
+            )
+            # 空值写为\N，与COPY的NULL选项对应
+            writer.writerow(['\\N' if value is None else value for value in values])
+        
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY {cls.__tablename__} ({', '.join(cls.COPY_COLUMNS)}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer
         )
     
     # === 查询方法 ===
@@ -128,7 +309,19 @@ class OperationLog(BaseModel):
             str: 操作摘要字符串
         """
         user_name = self.user.username if self.user else 'System'
-        return f"{user_name} {self.operation_type} {self.resource_type}"
+        return f"{user_name} {self.operation_label} {self.resource_label}"
+    
+    @property
+    def operation_label(self):
+        """操作类型名称，如CREATE"""
+        value = self.operation_type
+        return value.label if isinstance(value, OperationType) else value
+    
+    @property
+    def resource_label(self):
+        """资源类型名称，如prompt"""
+        value = self.resource_type
+        return value.label if isinstance(value, ResourceType) else value
     
     def get_detail_value(self, key, default=None):
         """
@@ -141,9 +334,8 @@ class OperationLog(BaseModel):
         Returns:
             操作详情值
         """
-        if self.operation_detail is None:
-            return default
-        return self.operation_detail.get(key, default)
+        detail = self.operation_detail
+        return detail.get(key, default) if detail else default
     
     # === 序列化方法 ===
     def to_dict(self, include_relations=False, exclude_fields=None):
@@ -159,6 +351,12 @@ class OperationLog(BaseModel):
         """
         result = super().to_dict(exclude_fields=exclude_fields)
         
+        # 类型字段对外仍输出名称
+        if 'operation_type' in result:
+            result['operation_type'] = self.operation_label
+        if 'resource_type' in result:
+            result['resource_type'] = self.resource_label
+        
         # 添加关联数据
         if include_relations and self.user:
             result['user'] = self.user.to_dict(exclude_fields=['password_hash'])
@@ -171,5 +369,5 @@ class OperationLog(BaseModel):
     def __repr__(self):
         """操作日志的字符串表示"""
         return (f"<OperationLog(id={self.id}, user_id={self.user_id}, "
-                f"operation='{self.operation_type}', resource='{self.resource_type}')>")
+                f"operation='{self.operation_label}', resource='{self.resource_label}')>")
 
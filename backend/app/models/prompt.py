@@ -5,10 +5,12 @@
 提示词是系统的核心业务实体，承载了内容管理、版本控制、协作编辑等核心功能。
 """
 
-import hashlib
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
-from .base import BaseModel
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Boolean, Index, select, and_, or_, text, inspect
+from sqlalchemy.orm import relationship, validates, deferred, object_session
+from .base import BaseModel, calculate_content_hash
+from .prompt_collaborator import PromptCollaborator
+from .prompt_tag import PromptTag
+from .prompt_version import PromptVersion
 
 
 class Prompt(BaseModel):
@@ -31,6 +33,15 @@ class Prompt(BaseModel):
     """
     
     __tablename__ = 'prompts'
+    __table_args__ = (
+        # 公开且正常的提示词单独建部分索引，可见性查询中的公开分支只扫描这部分
+        Index(
+            'ix_prompts_public',
+            'id',
+            postgresql_where=text('visibility = 3 AND status = 1'),
+            sqlite_where=text('visibility = 3 AND status = 1')
+        ),
+    )
     
     # === 基本信息字段 ===
     title = Column(
@@ -45,17 +56,18 @@ class Prompt(BaseModel):
         comment='提示词描述，详细说明用途和使用方法'
     )
     
-    content = Column(
+    # 内容字段延迟加载，列表查询不传输大文本，首次访问时按组一并加载
+    content = deferred(Column(
         Text,
         nullable=False,
         comment='提示词内容，核心的prompt文本'
-    )
+    ), group='content')
     
-    content_hash = Column(
+    content_hash = deferred(Column(
         String(64),
         nullable=False,
         comment='内容哈希值，用于版本对比和去重'
-    )
+    ), group='content')
     
     # === 所有权和权限字段 ===
     owner_id = Column(
@@ -129,20 +141,29 @@ class Prompt(BaseModel):
     )
     
     # 一对多：一个提示词有多个版本
+    # 版本数量随编辑增长，访问时才加载；批量场景由查询显式使用selectinload
     versions = relationship(
         'PromptVersion',
         back_populates='prompt',
         cascade='all, delete-orphan',
-        lazy='dynamic',
+        lazy='select',
         order_by='PromptVersion.version_number.desc()'  # 按版本号降序排列
     )
     
-    # 多对多：提示词和标签的关联
+    # 多对多：提示词和标签的关联（用于写入）
     tag_associations = relationship(
         'PromptTag',
         back_populates='prompt',
         cascade='all, delete-orphan',
-        lazy='dynamic'
+        lazy='selectin'
+    )
+    
+    # 多对多：通过关联表直接读取标签，批量加载时一次查询取回所有标签
+    tags = relationship(
+        'Tag',
+        secondary='prompt_tags',
+        viewonly=True,
+        lazy='selectin'
     )
     
     # 一对多：一个提示词有多个协作者
@@ -150,10 +171,10 @@ class Prompt(BaseModel):
         'PromptCollaborator',
         back_populates='prompt',
         cascade='all, delete-orphan',
-        lazy='dynamic'
+        lazy='selectin'
     )
     
-    # 一对多：一个提示词有多个测试记录
+    # 一对多：一个提示词有多个测试记录（只追加、数量大，保持按需查询）
     test_records = relationship(
         'TestRecord',
         back_populates='prompt',
@@ -177,48 +198,58 @@ class Prompt(BaseModel):
         Returns:
             PromptVersion: 新创建的版本对象
         """
-        # 计算新内容的哈希值
-        new_hash = self._calculate_content_hash(new_content)
+        # 内容完全相同时直接返回，字符串比较比计算哈希快得多
+        if new_content == self.content:
+            return None
+        
+        old_hash = self.content_hash
+        
+        # 赋值时由_sync_content_hash同步更新content_hash
+        self.content = new_content
         
         # 如果内容没有变化，不创建新版本
-        if new_hash == self.content_hash:
+        if self.content_hash == old_hash:
             return None
         
-        # 导入PromptVersion（避免循环导入）
-        from .prompt_version import PromptVersion
-        
         # 创建新版本
         new_version = PromptVersion(
             prompt_id=self.id,
             version_number=self.version_count + 1,
             title=self.title,
             content=new_content,
-            content_hash=new_hash,
             change_summary=change_summary,
             author_id=author_id,
             is_current=True
         )
         
-        # 更新当前提示词
-        self.content = new_content
-        self.content_hash = new_hash
+        # 更新版本计数
         self.version_count += 1
         
         return new_version
     
+    @validates('content')
+    def _sync_content_hash(self, key, value):
+        """
+        内容赋值时同步更新哈希值
+        
+        无论通过update_content还是直接给content赋值，content_hash都不会过期。
+        """
+        self.content_hash = calculate_content_hash(value) if value is not None else None
+        return value
+    
     def _calculate_content_hash(self, content):
         """
         计算内容哈希值
         
-        使用SHA-256算法计算内容的哈希值，用于版本对比。
+        默认使用SHA-256算法计算内容的哈希值，用于版本对比。
         
         Args:
-            content (str): 要计算哈希的内容
+            content (str | bytes): 要计算哈希的内容
             
         Returns:
             str: 十六进制的哈希值
         """
-        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return calculate_content_hash(content)
     
     # === 版本管理方法 ===
     def get_current_version(self):
@@ -228,7 +259,7 @@ class Prompt(BaseModel):
         Returns:
             PromptVersion: 当前版本对象，如果没有则返回None
         """
-        return self.versions.filter_by(is_current=True).first()
+        return next((version for version in self.versions if version.is_current), None)
     
     def get_version_by_number(self, version_number):
         """
@@ -240,7 +271,10 @@ class Prompt(BaseModel):
         Returns:
             PromptVersion: 版本对象，如果没有则返回None
         """
-        return self.versions.filter_by(version_number=version_number).first()
+        return next(
+            (version for version in self.versions if version.version_number == version_number),
+            None
+        )
     
     def rollback_to_version(self, version_number, author_id):
         """
@@ -292,10 +326,7 @@ class Prompt(BaseModel):
         if self.is_owner(user_id):
             return True
         
-        return self.collaborators.filter_by(
-            user_id=user_id,
-            status=1
-        ).first() is not None
+        return self._find_active_collaborator(user_id) is not None
     
     def can_edit(self, user_id):
         """
@@ -310,10 +341,7 @@ class Prompt(BaseModel):
         if self.is_owner(user_id):
             return True
         
-        collaborator = self.collaborators.filter_by(
-            user_id=user_id,
-            status=1
-        ).first()
+        collaborator = self._find_active_collaborator(user_id)
         
         if not collaborator:
             return False
@@ -321,16 +349,21 @@ class Prompt(BaseModel):
         # 角色：1-所有者，2-编辑者，3-查看者
         return collaborator.role <= 2
     
-    def can_view(self, user_id):
+    def can_view(self, user_id, visible_set=None):
         """
         检查用户是否有查看权限
         
         Args:
             user_id (int): 用户ID
+            visible_set (frozenset): 由filter_visible_for预先算好的可见提示词ID集合，
+                提供时直接做集合判断，不再访问数据库
             
         Returns:
             bool: 是否有查看权限
         """
+        if visible_set is not None:
+            return self.id in visible_set
+        
         # 公开的提示词所有人都可以查看
         if self.visibility == 3:
             return True
@@ -345,37 +378,136 @@ class Prompt(BaseModel):
         
         return False
     
+    def _find_active_collaborator(self, user_id):
+        """
+        在已加载的协作者中查找状态正常的指定用户
+        
+        Args:
+            user_id (int): 用户ID
+            
+        Returns:
+            PromptCollaborator: 协作者对象，如果没有则返回None
+        """
+        for collaborator in self.collaborators:
+            if collaborator.user_id == user_id and collaborator.status == 1:
+                return collaborator
+        return None
+    
+    @classmethod
+    def _visible_clause(cls, user_id):
+        """
+        构造用户可见性的SQL条件
+        
+        规则与can_view一致：公开的所有人可见，其余的所有者可见，
+        协作者可见的提示词对状态正常的协作者可见。
+        
+        Args:
+            user_id (int): 用户ID
+            
+        Returns:
+            ColumnElement: 可见性条件
+        """
+        collaborating = select(PromptCollaborator.prompt_id).where(
+            PromptCollaborator.user_id == user_id,
+            PromptCollaborator.status == 1
+        )
+        return or_(
+            cls.visibility == 3,
+            cls.owner_id == user_id,
+            and_(cls.visibility == 2, cls.id.in_(collaborating))
+        )
+    
+    @classmethod
+    def visible_query(cls, user_id, status=1):
+        """
+        构造用户可以查看的提示词查询
+        
+        可见性判断下推到SQL中，列表接口不必取回全部记录再逐个调用can_view。
+        
+        Args:
+            user_id (int): 用户ID
+            status (int): 提示词状态，传None时不限制
+            
+        Returns:
+            Select: 可继续追加排序、分页条件的查询语句
+        """
+        stmt = select(cls).where(cls._visible_clause(user_id))
+        if status is not None:
+            stmt = stmt.where(cls.status == status)
+        return stmt
+    
+    @classmethod
+    def filter_visible_for(cls, session, ids, user_id):
+        """
+        批量计算用户可以查看的提示词
+        
+        一次查询完成，列表接口可以先算出集合，再逐个传给can_view。
+        
+        Args:
+            session: 数据库会话
+            ids (iterable): 待检查的提示词ID
+            user_id (int): 用户ID
+            
+        Returns:
+            frozenset: 用户可以查看的提示词ID集合
+        """
+        ids = list(ids)
+        if not ids:
+            return frozenset()
+        
+        stmt = select(cls.id).where(
+            cls.id.in_(ids),
+            cls._visible_clause(user_id)
+        )
+        return frozenset(session.scalars(stmt))
+    
     # === 标签管理方法 ===
     def add_tag(self, tag):
         """
         添加标签
         
+        关联通过tag_associations创建，同一会话中重复添加能在集合中找到尚未flush的关联。
+        
         Args:
             tag (Tag): 标签对象
+            
+        Returns:
+            PromptTag: 新建的关联对象，已经存在关联时返回None
         """
-        # 导入PromptTag（避免循环导入）
-        from .prompt_tag import PromptTag
-        
         # 检查是否已经存在关联
-        existing = self.tag_associations.filter_by(tag_id=tag.id).first()
-        if existing:
-            return
+        if self._find_tag_association(tag):
+            return None
         
-        # 创建新的关联
-        association = PromptTag(prompt_id=self.id, tag_id=tag.id)
+        # 创建新的关联，随提示词一起级联保存
+        association = PromptTag(tag=tag)
+        self.tag_associations.append(association)
+        self._expire_tags()
         return association
     
     def remove_tag(self, tag):
         """
         移除标签
         
+        关联从集合中移除后由delete-orphan级联在flush时删除。
+        
         Args:
             tag (Tag): 标签对象
+            
+        Returns:
+            PromptTag: 被移除的关联对象，不存在关联时返回None
         """
-        association = self.tag_associations.filter_by(tag_id=tag.id).first()
+        association = self._find_tag_association(tag)
         if association:
-            # 这里需要在session中删除
-            return association
+            self.tag_associations.remove(association)
+            self._expire_tags()
+        return association
+    
+    def _expire_tags(self):
+        """关联变化后过期只读的tags关系，下次访问时重新加载"""
+        session = object_session(self)
+        # 尚未持久化的提示词不能过期属性，其tags也还没有加载
+        if session is not None and self.id is not None and 'tags' in self.__dict__:
+            session.expire(self, ['tags'])
     
     def get_tags(self):
         """
@@ -384,7 +516,29 @@ class Prompt(BaseModel):
         Returns:
             list: 标签列表
         """
-        return [assoc.tag for assoc in self.tag_associations.all()]
+        return list(self.tags)
+    
+    def _find_tag_association(self, tag):
+        """
+        在关联集合中查找指定标签
+        
+        已持久化的关联按tag_id比较；尚未flush的关联tag_id为空，按标签对象比较，
+        不会为已持久化的关联逐个加载标签。
+        
+        Args:
+            tag (Tag): 标签对象
+            
+        Returns:
+            PromptTag: 关联对象，如果没有则返回None
+        """
+        tag_id = tag.id
+        for association in self.tag_associations:
+            if association.tag_id is None:
+                if association.tag is tag:
+                    return association
+            elif association.tag_id == tag_id:
+                return association
+        return None
     
     # === 状态管理方法 ===
     def is_active(self):
@@ -418,12 +572,13 @@ class Prompt(BaseModel):
         # last_tested_at 会在创建测试记录时更新
     
     # === 序列化方法 ===
-    def to_dict(self, include_content=True, include_relations=False, exclude_fields=None):
+    def to_dict(self, include_content=None, include_relations=False, exclude_fields=None):
         """
         将提示词模型转换为字典
         
         Args:
-            include_content (bool): 是否包含内容字段
+            include_content (bool): 是否包含内容字段；None表示内容已加载时才包含，
+                列表序列化不会为延迟加载的内容逐行查询
             include_relations (bool): 是否包含关联数据
             exclude_fields (list): 需要排除的字段列表
             
@@ -433,6 +588,9 @@ class Prompt(BaseModel):
         if exclude_fields is None:
             exclude_fields = []
         
+        if include_content is None:
+            include_content = 'content' not in inspect(self).unloaded
+        
         # 根据参数决定是否排除内容
         if not include_content:
             exclude_fields.extend(['content', 'content_hash'])
@@ -4,7 +4,7 @@
 定义了提示词和标签之间的多对多关联关系。
 """
 
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
@@ -18,6 +18,12 @@ class PromptTag(BaseModel):
     """
     
     __tablename__ = 'prompt_tags'
+    __table_args__ = (
+        # 同一提示词不重复关联同一标签
+        Index('ix_pt_prompt_tag', 'prompt_id', 'tag_id', unique=True),
+        # 按标签反查提示词，索引同时包含prompt_id，连接时无需回表
+        Index('ix_pt_tag_prompt', 'tag_id', 'prompt_id'),
+    )
     
     # === 关联字段 ===
     prompt_id = Column(
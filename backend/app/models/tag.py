@@ -5,9 +5,35 @@
 标签用于对提示词进行分类和组织，支持灵活的标签系统。
 """
 
-from sqlalchemy import Column, String, Integer, ForeignKey
-from sqlalchemy.orm import relationship
+from functools import lru_cache
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, select, func, update, case, text
+from sqlalchemy.orm import relationship, object_session
 from .base import BaseModel
+from .prompt import Prompt
+from .prompt_tag import PromptTag
+
+
+@lru_cache(maxsize=256)
+def _parse_hex_color(color):
+    """
+    解析HEX颜色为RGB元组
+    
+    标签颜色的取值很少，按颜色字符串缓存解析结果，序列化时不再重复解析。
+    
+    Args:
+        color (str): HEX格式的颜色值，如#FF5733
+        
+    Returns:
+        tuple: (r, g, b) 或 None
+    """
+    hex_color = color.lstrip('#')
+    if len(hex_color) != 6:
+        return None
+    
+    try:
+        return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return None
 
 
 class Tag(BaseModel):
@@ -20,6 +46,11 @@ class Tag(BaseModel):
     
     __tablename__ = 'tags'
     
+    __table_args__ = (
+        # 按创建者列出标签
+        Index('ix_tag_created_by', 'created_by'),
+    )
+    
     # === 基本信息字段 ===
     name = Column(
         String(50),
@@ -45,6 +76,7 @@ class Tag(BaseModel):
         Integer,
         nullable=False,
         default=0,
+        server_default=text('0'),
         comment='使用次数，用于统计标签热度'
     )
     
@@ -72,14 +104,71 @@ class Tag(BaseModel):
     )
     
     # === 使用统计方法 ===
+    @classmethod
+    def _usage_expr(cls, delta):
+        """
+        构建在数据库端调整使用次数的表达式，结果不小于0
+        
+        Args:
+            delta (int): 变化量
+            
+        Returns:
+            SQL表达式
+        """
+        new_count = cls.usage_count + delta
+        if delta >= 0:
+            return new_count
+        return case((new_count < 0, 0), else_=new_count)
+    
+    @classmethod
+    def bump_usage(cls, session, tag_ids, delta=1):
+        """
+        批量调整标签使用次数
+        
+        一条UPDATE语句在数据库端完成加减，并发调整不会丢失更新。
+        
+        Args:
+            session: 数据库会话
+            tag_ids: 标签ID集合
+            delta (int): 变化量，可为负数
+        """
+        tag_ids = list(tag_ids)
+        if not tag_ids or not delta:
+            return
+        
+        session.execute(
+            update(cls)
+            .where(cls.id.in_(tag_ids))
+            .values(usage_count=cls._usage_expr(delta))
+            .execution_options(synchronize_session=False)
+        )
+    
+    def _adjust_usage(self, delta):
+        """
+        调整本标签的使用次数
+        
+        已持久化的标签立即执行数据库端的UPDATE，多次调用逐次累加；
+        之后过期内存中的usage_count，下次访问时重新读取。
+        未持久化或不在会话中的标签直接修改内存中的值。
+        
+        Args:
+            delta (int): 变化量，可为负数
+        """
+        session = object_session(self)
+        if self.id is None or session is None:
+            self.usage_count = max((self.usage_count or 0) + delta, 0)
+            return
+        
+        Tag.bump_usage(session, [self.id], delta)
+        session.expire(self, ['usage_count'])
+    
     def increment_usage(self):
         """增加使用次数"""
-        self.usage_count += 1
+        self._adjust_usage(1)
     
     def decrement_usage(self):
         """减少使用次数"""
-        if self.usage_count > 0:
-            self.usage_count -= 1
+        self._adjust_usage(-1)
     
     # === 颜色管理方法 ===
     def set_color(self, color_hex):
@@ -102,25 +191,33 @@ class Tag(BaseModel):
         """
         if not self.color:
             return None
-        
-        hex_color = self.color.lstrip('#')
-        if len(hex_color) != 6:
-            return None
-        
-        try:
-            return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-        except ValueError:
-            return None
+        return _parse_hex_color(self.color)
     
     # === 关联管理方法 ===
+    def _prompts_stmt(self):
+        """
+        构建查询此标签下提示词的语句
+        
+        Returns:
+            Select: 通过PromptTag连接Prompt的查询语句
+        """
+        return select(Prompt).join(
+            PromptTag, PromptTag.prompt_id == Prompt.id
+        ).where(PromptTag.tag_id == self.id)
+    
     def get_prompts(self):
         """
         获取使用此标签的所有提示词
         
+        一次JOIN查询取回，不逐个加载关联对象。
+        
         Returns:
             list: 提示词列表
         """
-        return [assoc.prompt for assoc in self.prompt_associations.all()]
+        session = object_session(self)
+        if session is None:
+            return []
+        return list(session.scalars(self._prompts_stmt()))
     
     def get_active_prompts(self):
         """
@@ -129,8 +226,24 @@ class Tag(BaseModel):
         Returns:
             list: 活跃提示词列表
         """
-        return [assoc.prompt for assoc in self.prompt_associations.all() 
-                if assoc.prompt.is_active()]
+        session = object_session(self)
+        if session is None:
+            return []
+        return list(session.scalars(self._prompts_stmt().where(Prompt.status == 1)))
+    
+    def get_prompt_count(self):
+        """
+        统计使用此标签的提示词数量
+        
+        Returns:
+            int: 提示词数量
+        """
+        session = object_session(self)
+        if session is None:
+            return 0
+        return session.scalar(
+            select(func.count()).select_from(PromptTag).where(PromptTag.tag_id == self.id)
+        )
     
     # === 序列化方法 ===
     def to_dict(self, include_relations=False, exclude_fields=None):
@@ -149,7 +262,7 @@ class Tag(BaseModel):
         # 添加关联数据
         if include_relations:
             result['creator'] = self.creator.to_dict(exclude_fields=['password_hash'])
-            result['prompt_count'] = self.prompt_associations.count()
+            result['prompt_count'] = self.get_prompt_count()
         
         # 添加计算字段
         result['color_rgb'] = self.get_color_rgb()
@@ -5,7 +5,8 @@
 记录提示词在不同AI模型上的测试结果和性能数据。
 """
 
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, Integer, SmallInteger, ForeignKey, JSON, Index, CheckConstraint, func, and_
+from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
@@ -20,6 +21,15 @@ class TestRecord(BaseModel):
     
     __tablename__ = 'test_records'
     
+    __table_args__ = (
+        # 按提示词统计测试结果
+        Index('ix_tr_prompt_status', 'prompt_id', 'status'),
+        # 按用户和时间列出测试记录
+        Index('ix_tr_user_created', 'user_id', 'created_at'),
+        CheckConstraint('status IN (0, 1, 2)', name='ck_tr_status'),
+        CheckConstraint('rating BETWEEN 1 AND 5', name='ck_tr_rating'),
+    )
+    
     # === 关联字段 ===
     prompt_id = Column(
         Integer,
@@ -76,7 +86,7 @@ class TestRecord(BaseModel):
     
     # === 评估字段 ===
     rating = Column(
-        Integer,
+        SmallInteger,
         nullable=True,
         comment='用户评分，1-5分'
     )
@@ -89,7 +99,7 @@ class TestRecord(BaseModel):
     
     # === 状态字段 ===
     status = Column(
-        Integer,
+        SmallInteger,
         nullable=False,
         default=1,
         comment='测试状态：1-成功，0-失败，2-超时'
@@ -118,14 +128,18 @@ class TestRecord(BaseModel):
     )
     
     # === 状态判断方法 ===
+    # 判断方法可直接用于查询条件，如 query.filter(TestRecord.is_successful())
+    @hybrid_method
     def is_successful(self):
         """测试是否成功"""
         return self.status == 1
     
+    @hybrid_method
     def is_failed(self):
         """测试是否失败"""
         return self.status == 0
     
+    @hybrid_method
     def is_timeout(self):
         """测试是否超时"""
         return self.status == 2
@@ -149,13 +163,31 @@ class TestRecord(BaseModel):
         
         return self.token_usage.get(key, 0)
     
-    def get_total_tokens(self):
-        """获取总Token数"""
-        if self.token_usage is None:
+    @hybrid_property
+    def total_tokens(self):
+        """
+        总Token数
+        
+        实例上在Python中求和；在查询中展开为数据库端的JSON取值表达式，
+        可直接用于排序、过滤和聚合统计。
+        """
+        usage = self.token_usage
+        if not usage:
             return 0
         
-        return (self.token_usage.get('prompt_tokens', 0) + 
-                self.token_usage.get('completion_tokens', 0))
+        get = usage.get
+        return get('prompt_tokens', 0) + get('completion_tokens', 0)
+    
+    @total_tokens.inplace.expression
+    @classmethod
+    def _total_tokens_expression(cls):
+        """总Token数的SQL表达式"""
+        return (func.coalesce(cls.token_usage['prompt_tokens'].as_integer(), 0) +
+                func.coalesce(cls.token_usage['completion_tokens'].as_integer(), 0))
+    
+    def get_total_tokens(self):
+        """获取总Token数"""
+        return self.total_tokens
     
     def get_cost_estimate(self, model_pricing=None):
         """
@@ -185,6 +217,7 @@ class TestRecord(BaseModel):
             return None
         return self.response_time / 1000.0
     
+    @hybrid_method
     def is_fast_response(self, threshold_ms=5000):
         """
         判断是否为快速响应
@@ -199,6 +232,12 @@ class TestRecord(BaseModel):
             return False
         return self.response_time <= threshold_ms
     
+    @is_fast_response.inplace.expression
+    @classmethod
+    def _is_fast_response_expression(cls, threshold_ms=5000):
+        """快速响应的SQL条件"""
+        return and_(cls.response_time.isnot(None), cls.response_time <= threshold_ms)
+    
     # === 评分相关方法 ===
     def set_rating(self, rating, notes=None):
         """
@@ -213,6 +252,7 @@ class TestRecord(BaseModel):
         if notes:
             self.notes = notes
     
+    @hybrid_method
     def is_good_rating(self, threshold=4):
         """
         判断是否为好评
@@ -227,6 +267,12 @@ class TestRecord(BaseModel):
             return False
         return self.rating >= threshold
     
+    @is_good_rating.inplace.expression
+    @classmethod
+    def _is_good_rating_expression(cls, threshold=4):
+        """好评的SQL条件"""
+        return and_(cls.rating.isnot(None), cls.rating >= threshold)
+    
     # === 序列化方法 ===
     def to_dict(self, include_relations=False, exclude_fields=None):
         """
@@ -253,7 +299,7 @@ class TestRecord(BaseModel):
                 )
         
         # 添加计算字段
-        result['total_tokens'] = self.get_total_tokens()
+        result['total_tokens'] = self.total_tokens
         result['response_time_seconds'] = self.get_response_time_seconds()
         result['is_successful'] = self.is_successful()
         result['is_good_rating'] = self.is_good_rating()
@@ -0,0 +1,50 @@
+"""
+缓存配置模块
+
+提供进程共享的Redis客户端，用于缓存读多写少的数据。
+redis为可选依赖；未安装或未启用时get_redis()返回None，调用方直接访问数据库。
+"""
+
+import threading
+
+try:
+    import redis
+except ImportError:  # redis为可选依赖
+    redis = None
+
+# 缓存访问失败时的异常类型，调用方捕获后回退到数据库
+CACHE_ERRORS = (redis.RedisError,) if redis is not None else ()
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_redis():
+    """
+    获取Redis客户端
+    
+    首次调用时根据配置创建，之后复用同一个连接池。
+    
+    Returns:
+        Redis: Redis客户端，未安装redis或未启用缓存时返回None
+    """
+    global _client
+    
+    if _client is not None or redis is None:
+        return _client
+    
+    from src.config import config
+    
+    if not config.REDIS_ENABLED:
+        return None
+    
+    with _lock:
+        if _client is None:
+            # 连接超时设置得很短，Redis不可用时尽快回退到数据库
+            _client = redis.Redis.from_url(
+                config.REDIS_URL,
+                socket_connect_timeout=0.2,
+                socket_timeout=0.2
+            )
+    return _client
+
@@ -6,14 +6,107 @@
 """
 
 import os
+import threading
 from datetime import timedelta
+from functools import cached_property
+from types import MappingProxyType
 from dotenv import load_dotenv
 
+# 本模块所在目录和项目根目录（prompt_manager_api），导入时计算一次
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(_MODULE_DIR))
+
 # 加载环境变量文件
 # 首先尝试加载 .env 文件，如果不存在则使用系统环境变量
-env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
-if os.path.exists(env_path):
-    load_dotenv(env_path)
+env_path = os.path.join(_PROJECT_ROOT, '.env')
+
+# 已加载标记，写入环境变量后子进程也会跳过重复解析
+_DOTENV_FLAG = '_DOTENV_LOADED'
+_dotenv_lock = threading.Lock()
+
+
+def _ensure_dotenv():
+    """
+    加载.env文件，整个进程（及其子进程）只解析一次
+    
+    已存在的环境变量不会被.env覆盖。
+    """
+    if os.environ.get(_DOTENV_FLAG):
+        return
+    
+    with _dotenv_lock:
+        if os.environ.get(_DOTENV_FLAG):
+            return
+        if os.path.exists(env_path):
+            load_dotenv(env_path, override=False)
+        os.environ[_DOTENV_FLAG] = '1'
+
+
+_ensure_dotenv()
+
+# 环境变量快照，导入时读取一次，之后所有配置项都从这里取值
+_ENV = os.environ.copy()
+
+
+def _get(name, default=None, cast=str):
+    """
+    从环境变量快照中读取配置
+    
+    Args:
+        name (str): 环境变量名
+        default: 未设置时的默认值
+        cast (callable): 类型转换函数，如int
+        
+    Returns:
+        转换后的配置值
+    """
+    value = _ENV.get(name, default)
+    if value is None or cast is str:
+        return value
+    return cast(value)
+
+
+# 表示“真”的取值
+_TRUE_SET = frozenset(('true', '1', 'yes', 'on'))
+
+
+def _env_bool(name, default=False):
+    """
+    从环境变量快照中读取布尔配置
+    
+    Args:
+        name (str): 环境变量名
+        default (bool): 未设置时的默认值
+        
+    Returns:
+        bool: 配置值
+    """
+    value = _ENV.get(name)
+    if value is None:
+        return default
+    return value.lower() in _TRUE_SET
+
+
+# 数据库连接参数，导入时整理一次
+_DB_PARAMS = {
+    'mysql': {
+        'host': _get('MYSQL_HOST', 'localhost'),
+        'port': _get('MYSQL_PORT', '3306'),
+        'user': _get('MYSQL_USER', 'root'),
+        'password': _get('MYSQL_PASSWORD', ''),
+        'database': _get('MYSQL_DATABASE', 'prompt_manager_db'),
+    },
+    'postgresql': {
+        'host': _get('POSTGRES_HOST', 'localhost'),
+        'port': _get('POSTGRES_PORT', '5432'),
+        'user': _get('POSTGRES_USER', 'postgres'),
+        'password': _get('POSTGRES_PASSWORD', ''),
+        'database': _get('POSTGRES_DATABASE', 'prompt_manager_db'),
+    },
+    'sqlite': {
+        'path': _get('SQLITE_PATH', 'database/app.db'),
+    },
+}
 
 
 class Config:
@@ -25,112 +118,134 @@ class Config:
     """
     
     # === 应用基础配置 ===
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-    DEBUG = os.getenv('DEBUG', 'false').lower() in ('true', '1', 'yes', 'on')
+    SECRET_KEY = _get('SECRET_KEY', 'dev-secret-key-change-in-production')
+    DEBUG = _env_bool('DEBUG')
     TESTING = False
     
     # === 服务器配置 ===
-    HOST = os.getenv('HOST', '0.0.0.0')
-    PORT = int(os.getenv('PORT', 5000))
+    HOST = _get('HOST', '0.0.0.0')
+    PORT = _get('PORT', 5000, int)
+    # 静态资源的浏览器缓存时间（秒），index.html始终要求重新验证
+    STATIC_MAX_AGE = _get('STATIC_MAX_AGE', 3600, int)
     
     # === 数据库配置 ===
-    DATABASE_TYPE = os.getenv('DATABASE_TYPE', 'sqlite')
+    DATABASE_TYPE = _get('DATABASE_TYPE', 'sqlite')
+    # 应用启动时是否自动建表；多进程部署应关闭，改为单独执行flask init-db
+    RUN_MIGRATIONS = _env_bool('RUN_MIGRATIONS', True)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_RECORD_QUERIES = True
+    # 记录每条查询的耗时和调用栈开销较大，只在开发和测试环境启用
+    SQLALCHEMY_RECORD_QUERIES = False
     SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
-        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
-        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
-        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 3600))
+        'pool_size': _get('DB_POOL_SIZE', 10, int),
+        'max_overflow': _get('DB_MAX_OVERFLOW', 20, int),
+        'pool_timeout': _get('DB_POOL_TIMEOUT', 30, int),
+        'pool_recycle': _get('DB_POOL_RECYCLE', 3600, int),
+        # 借出连接前先探测一次，避免拿到已被数据库或防火墙断开的连接
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True)
     }
+    # 是否记录慢查询，关闭后非调试模式下不注册SQL计时监听器
+    SLOW_QUERY_LOG_ENABLED = _env_bool('SLOW_QUERY_LOG_ENABLED', True)
+    # 慢查询阈值（秒），超过该耗时的SQL会记录警告日志
+    SLOW_QUERY_SEC = _get('SLOW_QUERY_SEC', 0.5, float)
     
     # === JWT配置 ===
     JWT_SECRET_KEY = SECRET_KEY
-    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=int(os.getenv('JWT_EXPIRATION_HOURS', 24)))
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=_get('JWT_EXPIRATION_HOURS', 24, int))
     JWT_ALGORITHM = 'HS256'
     
+    # === 缓存配置 ===
+    # 用户资料缓存时间（秒），资料修改时主动失效
+    USER_CACHE_TTL = _get('USER_CACHE_TTL', 300, int)
+    
     # === 安全配置 ===
-    PASSWORD_MIN_LENGTH = int(os.getenv('PASSWORD_MIN_LENGTH', 8))
-    MAX_LOGIN_ATTEMPTS = int(os.getenv('MAX_LOGIN_ATTEMPTS', 5))
-    ACCOUNT_LOCKOUT_MINUTES = int(os.getenv('ACCOUNT_LOCKOUT_MINUTES', 30))
+    PASSWORD_MIN_LENGTH = _get('PASSWORD_MIN_LENGTH', 8, int)
+    MAX_LOGIN_ATTEMPTS = _get('MAX_LOGIN_ATTEMPTS', 5, int)
+    ACCOUNT_LOCKOUT_MINUTES = _get('ACCOUNT_LOCKOUT_MINUTES', 30, int)
+    # 最后登录时间的更新间隔（分钟），间隔内重复登录不再写库
+    LAST_LOGIN_UPDATE_MINUTES = _get('LAST_LOGIN_UPDATE_MINUTES', 15, int)
     
     # === 文件上传配置 ===
-    MAX_CONTENT_LENGTH = int(os.getenv('MAX_UPLOAD_SIZE', 10)) * 1024 * 1024  # MB转字节
-    ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'txt,md,json').split(','))
-    UPLOAD_FOLDER = os.getenv('UPLOAD_PATH', 'uploads')
+    MAX_CONTENT_LENGTH = _get('MAX_UPLOAD_SIZE', 10, int) * 1024 * 1024  # MB转字节
+    # 去除空白并统一小写，使用不可变集合避免子类修改影响基类
+    ALLOWED_EXTENSIONS = frozenset(
+        ext.strip().lower()
+        for ext in _get('ALLOWED_EXTENSIONS', 'txt,md,json').split(',')
+        if ext.strip()
+    )
+    UPLOAD_FOLDER = _get('UPLOAD_PATH', 'uploads')
     
     # === AI模型配置 ===
-    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-    OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-    OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4')
+    OPENAI_API_KEY = _get('OPENAI_API_KEY')
+    OPENAI_API_BASE = _get('OPENAI_API_BASE', 'https://api.openai.com/v1')
+    OPENAI_MODEL = _get('OPENAI_MODEL', 'gpt-4')
     
-    CLAUDE_API_KEY = os.getenv('CLAUDE_API_KEY')
-    CLAUDE_API_BASE = os.getenv('CLAUDE_API_BASE', 'https://api.anthropic.com')
-    CLAUDE_MODEL = os.getenv('CLAUDE_MODEL', 'claude-3-opus-20240229')
+    CLAUDE_API_KEY = _get('CLAUDE_API_KEY')
+    CLAUDE_API_BASE = _get('CLAUDE_API_BASE', 'https://api.anthropic.com')
+    CLAUDE_MODEL = _get('CLAUDE_MODEL', 'claude-3-opus-20240229')
     
     # === 日志配置 ===
-    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
-    LOG_FILE_PATH = os.getenv('LOG_FILE_PATH', 'logs/prompt_manager.log')
-    LOG_MAX_SIZE = int(os.getenv('LOG_MAX_SIZE', 10)) * 1024 * 1024  # MB转字节
-    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_LEVEL = _get('LOG_LEVEL', 'INFO')
+    LOG_FILE_PATH = _get('LOG_FILE_PATH', 'logs/prompt_manager.log')
+    LOG_BACKUP_COUNT = _get('LOG_BACKUP_COUNT', 5, int)
+    # 操作日志是否记录数据内容（创建数据、更新前后的数据），默认只记录字段名
+    LOG_DB_PAYLOADS = _env_bool('LOG_DB_PAYLOADS')
+    
+    # === 操作日志批量写入配置 ===
+    LOG_COMMIT_DELAY_MS = _get('LOG_COMMIT_DELAY_MS', 5, int)
+    LOG_COMMIT_SIBLINGS = _get('LOG_COMMIT_SIBLINGS', 32, int)
+    LOG_MAX_BATCH = _get('LOG_MAX_BATCH', 1000, int)
     
     # === Redis配置 ===
-    REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
-    REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
-    REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', '')
-    REDIS_DB = int(os.getenv('REDIS_DB', 0))
+    REDIS_ENABLED = _env_bool('REDIS_ENABLED')
+    REDIS_HOST = _get('REDIS_HOST', 'localhost')
+    REDIS_PORT = _get('REDIS_PORT', 6379, int)
+    REDIS_PASSWORD = _get('REDIS_PASSWORD', '')
+    REDIS_DB = _get('REDIS_DB', 0, int)
     
     # === 邮件配置 ===
-    MAIL_SERVER = os.getenv('MAIL_SERVER')
-    MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
-    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'true').lower() in ('true', '1', 'yes', 'on')
-    MAIL_USERNAME = os.getenv('MAIL_USERNAME')
-    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
-    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER')
+    MAIL_SERVER = _get('MAIL_SERVER')
+    MAIL_PORT = _get('MAIL_PORT', 587, int)
+    MAIL_USE_TLS = _env_bool('MAIL_USE_TLS', True)
+    MAIL_USERNAME = _get('MAIL_USERNAME')
+    MAIL_PASSWORD = _get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = _get('MAIL_DEFAULT_SENDER')
     
     # === 功能开关配置 ===
-    ENABLE_REGISTRATION = os.getenv('ENABLE_REGISTRATION', 'true').lower() in ('true', '1', 'yes', 'on')
-    REQUIRE_EMAIL_VERIFICATION = os.getenv('REQUIRE_EMAIL_VERIFICATION', 'false').lower() in ('true', '1', 'yes', 'on')
-    DEFAULT_USER_ROLE = os.getenv('DEFAULT_USER_ROLE', 'user')
+    ENABLE_REGISTRATION = _env_bool('ENABLE_REGISTRATION', True)
+    REQUIRE_EMAIL_VERIFICATION = _env_bool('REQUIRE_EMAIL_VERIFICATION')
+    DEFAULT_USER_ROLE = _get('DEFAULT_USER_ROLE', 'user')
     
-    @property
+    @cached_property
     def SQLALCHEMY_DATABASE_URI(self):
         """
         动态生成数据库连接URI
         
         根据配置的数据库类型生成相应的连接字符串。
         这个属性方法体现了配置的灵活性。
+        每个配置实例只生成一次，之后直接返回缓存结果。
         """
-        if self.DATABASE_TYPE.lower() == 'mysql':
-            host = os.getenv('MYSQL_HOST', 'localhost')
-            port = os.getenv('MYSQL_PORT', '3306')
-            user = os.getenv('MYSQL_USER', 'root')
-            password = os.getenv('MYSQL_PASSWORD', '')
-            database = os.getenv('MYSQL_DATABASE', 'prompt_manager_db')
-            
-            return f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}?charset=utf8mb4"
+        database_type = self.DATABASE_TYPE.lower()
         
-        elif self.DATABASE_TYPE.lower() == 'postgresql':
-            host = os.getenv('POSTGRES_HOST', 'localhost')
-            port = os.getenv('POSTGRES_PORT', '5432')
-            user = os.getenv('POSTGRES_USER', 'postgres')
-            password = os.getenv('POSTGRES_PASSWORD', '')
-            database = os.getenv('POSTGRES_DATABASE', 'prompt_manager_db')
-            
-            return f"postgresql://{user}:{password}@{host}:{port}/{database}"
+        if database_type == 'mysql':
+            params = _DB_PARAMS['mysql']
+            return ("mysql+pymysql://{user}:{password}@{host}:{port}/{database}"
+                    "?charset=utf8mb4".format(**params))
+        
+        elif database_type == 'postgresql':
+            params = _DB_PARAMS['postgresql']
+            return "postgresql://{user}:{password}@{host}:{port}/{database}".format(**params)
         
         else:  # 默认使用SQLite
-            sqlite_path = os.getenv('SQLITE_PATH', 'database/app.db')
+            sqlite_path = _DB_PARAMS['sqlite']['path']
             # 确保路径是绝对路径
             if not os.path.isabs(sqlite_path):
-                base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-                sqlite_path = os.path.join(base_dir, sqlite_path)
+                sqlite_path = os.path.join(_PROJECT_ROOT, sqlite_path)
             
             return f"sqlite:///{sqlite_path}"
     
-    @property
+    @cached_property
     def REDIS_URL(self):
-        """Redis连接URL"""
+        """Redis连接URL（每个配置实例只生成一次）"""
         if self.REDIS_PASSWORD:
             return f"redis://:{self.REDIS_PASSWORD}@{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB}"
         else:
@@ -161,26 +276,31 @@ class Config:
         if self.DATABASE_TYPE.lower() == 'mysql':
             required_mysql_vars = ['MYSQL_HOST', 'MYSQL_USER', 'MYSQL_PASSWORD', 'MYSQL_DATABASE']
             for var in required_mysql_vars:
-                if not os.getenv(var):
+                if not _get(var):
                     errors.append(f"MySQL配置缺少必需的环境变量: {var}")
         
         return len(errors) == 0, errors
     
-    def get_feature_flags(self):
-        """
-        获取功能开关配置
-        
-        Returns:
-            dict: 功能开关字典
-        """
-        return {
+    @cached_property
+    def _feature_flags(self):
+        """功能开关只读映射，配置在启动后不会变化，每个实例只构建一次"""
+        return MappingProxyType({
             'registration_enabled': self.ENABLE_REGISTRATION,
             'email_verification_required': self.REQUIRE_EMAIL_VERIFICATION,
             'ai_testing_enabled': bool(self.OPENAI_API_KEY or self.CLAUDE_API_KEY),
             'file_upload_enabled': True,
             'collaboration_enabled': True,
             'version_control_enabled': True
-        }
+        })
+    
+    def get_feature_flags(self):
+        """
+        获取功能开关配置
+        
+        Returns:
+            MappingProxyType: 只读的功能开关映射，需要修改时请先复制为dict
+        """
+        return self._feature_flags
 
 
 class DevelopmentConfig(Config):
@@ -195,6 +315,9 @@ class DevelopmentConfig(Config):
     # 开发环境使用更详细的日志
     LOG_LEVEL = 'DEBUG'
     
+    # 开发环境记录查询信息，便于分析SQL
+    SQLALCHEMY_RECORD_QUERIES = True
+    
     # 开发环境允许所有来源的跨域请求
     CORS_ORIGINS = ['*']
     
@@ -214,6 +337,9 @@ class ProductionConfig(Config):
     # 生产环境使用更严格的日志级别
     LOG_LEVEL = 'WARNING'
     
+    # 生产环境多个worker同时启动，默认不在启动时建表
+    RUN_MIGRATIONS = _env_bool('RUN_MIGRATIONS')
+    
     # 生产环境限制跨域请求来源
     CORS_ORIGINS = []  # 需要根据实际前端域名配置
     
@@ -238,6 +364,12 @@ class TestingConfig(Config):
     # 测试环境使用内存数据库
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     
+    # 内存数据库使用StaticPool，不接受pool_size等连接池参数
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    
+    # 测试环境记录查询信息，便于断言查询次数
+    SQLALCHEMY_RECORD_QUERIES = True
+    
     # 测试环境禁用CSRF保护
     WTF_CSRF_ENABLED = False
     
@@ -6,15 +6,78 @@
 """
 
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from sqlalchemy import event
+from sqlalchemy import event, text
 from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+import logging
 import time
-import sqlite3
 
 # 全局数据库实例
 db = SQLAlchemy()
-migrate = Migrate()
+
+# 数据库迁移实例，首次init_app时创建（延迟导入flask_migrate）
+migrate = None
+
+# SQLite连接初始化语句，一次executescript执行完毕
+# foreign_keys: 启用外键约束
+# journal_mode: WAL模式提高并发性能
+# synchronous: 同步模式
+# cache_size: 缓存页数
+# mmap_size: 内存映射256MB，减少读取时的系统调用
+# temp_store: 临时表和索引放在内存中
+_SQLITE_PRAGMAS = (
+    "PRAGMA foreign_keys=ON;"
+    "PRAGMA journal_mode=WAL;"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA cache_size=10000;"
+    "PRAGMA mmap_size=268435456;"
+    "PRAGMA temp_store=MEMORY;"
+)
+
+# 健康检查使用的探测语句，只构造一次
+_PING_STMT = text('SELECT 1')
+
+# 健康检查结果的缓存时间（秒），频繁的探活请求不会每次都占用连接
+_HEALTH_CACHE_TTL = 2.0
+
+# 默认系统配置，模块加载时构建一次
+_DEFAULT_SYSTEM_CONFIGS = (
+    {
+        'config_key': 'system.version',
+        'config_value': '1.0.0',
+        'config_type': 'string',
+        'description': '系统版本号',
+        'is_public': True
+    },
+    {
+        'config_key': 'system.name',
+        'config_value': 'Prompt Manager',
+        'config_type': 'string',
+        'description': '系统名称',
+        'is_public': True
+    },
+    {
+        'config_key': 'ui.theme',
+        'config_value': 'light',
+        'config_type': 'string',
+        'description': '默认UI主题',
+        'is_public': True
+    },
+    {
+        'config_key': 'features.collaboration',
+        'config_value': 'true',
+        'config_type': 'boolean',
+        'description': '是否启用协作功能',
+        'is_public': True
+    },
+    {
+        'config_key': 'features.ai_testing',
+        'config_value': 'true',
+        'config_type': 'boolean',
+        'description': '是否启用AI测试功能',
+        'is_public': True
+    }
+)
 
 
 class DatabaseConfig:
@@ -33,6 +96,10 @@ class DatabaseConfig:
             app: Flask应用实例
         """
         self.app = app
+        # 脱敏后的数据库URL，启动后不会变化，首次获取时缓存
+        self._cached_url_str = None
+        # 最近一次健康检查结果：(过期时间, 结果)
+        self._health_cache = None
         if app is not None:
             self.init_app(app)
     
@@ -46,14 +113,39 @@ class DatabaseConfig:
         # 初始化SQLAlchemy
         db.init_app(app)
         
+        # 模型按需导入，这里统一注册，保证关系映射能解析到所有模型
+        from src.models import load_all_models
+        load_all_models()
+        
         # 初始化数据库迁移
-        migrate.init_app(app, db)
+        self._init_migrate(app)
         
         # 配置数据库事件监听器
         self._setup_event_listeners(app)
         
         # 注册应用上下文处理器
         self._register_context_processors(app)
+        
+        # 启动操作日志后台写入线程
+        self._start_log_writer(app)
+    
+    def _init_migrate(self, app):
+        """
+        初始化数据库迁移
+        
+        flask_migrate只在真正初始化应用时导入，
+        只需要get_db()的进程（如命令行工具、健康探测）不必加载它。
+        
+        Args:
+            app: Flask应用实例
+        """
+        global migrate
+        
+        from flask_migrate import Migrate
+        
+        if migrate is None:
+            migrate = Migrate()
+        migrate.init_app(app, db)
     
     def _setup_event_listeners(self, app):
         """
@@ -67,43 +159,77 @@ class DatabaseConfig:
         from src.config.logger import get_logger
         logger = get_logger('database')
         
-        @event.listens_for(Engine, "before_cursor_execute")
-        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-            """SQL执行前的监听器"""
-            context._query_start_time = time.time()
+        # 配置在注册时读取一次，监听器内部不再查询app.config
+        debug = bool(app.config.get('DEBUG'))
+        # 阈值换算为整数纳秒，快速路径上只做整数比较
+        slow_threshold_ns = int(app.config.get('SLOW_QUERY_SEC', 0.5) * 1_000_000_000)
+        perf_counter_ns = time.perf_counter_ns
+        
+        if debug:
+            log_sql = logger.isEnabledFor(logging.DEBUG)
+            
+            @event.listens_for(Engine, "before_cursor_execute")
+            def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                """SQL执行前的监听器"""
+                context._query_start_ns = perf_counter_ns()
+                
+                # 在调试模式下记录SQL语句
+                if log_sql:
+                    logger.debug("SQL Query: %s", statement)
+                    if parameters:
+                        logger.debug("Parameters: %s", parameters)
             
-            # 在调试模式下记录SQL语句
-            if app.config.get('DEBUG'):
-                logger.debug(f"SQL Query: {statement}")
-                if parameters:
-                    logger.debug(f"Parameters: {parameters}")
-        
-        @event.listens_for(Engine, "after_cursor_execute")
-        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-            """SQL执行后的监听器"""
-            total_time = time.time() - context._query_start_time
+            @event.listens_for(Engine, "after_cursor_execute")
+            def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                """SQL执行后的监听器"""
+                elapsed_ns = perf_counter_ns() - context._query_start_ns
+                
+                # 记录慢查询
+                if elapsed_ns > slow_threshold_ns:
+                    logger.warning("Slow Query (%.3fs): %s...", elapsed_ns / 1e9, statement[:100])
+                elif log_sql:
+                    logger.debug("Query Time: %.3fs", elapsed_ns / 1e9)
+        elif app.config.get('SLOW_QUERY_LOG_ENABLED', True):
+            # 非调试模式只统计耗时并记录慢查询；关闭慢查询日志时不注册监听器
+            @event.listens_for(Engine, "before_cursor_execute")
+            def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                """SQL执行前记录开始时间"""
+                context._query_start_ns = perf_counter_ns()
             
-            # 记录慢查询
-            if total_time > 0.5:  # 超过500ms的查询
-                logger.warning(f"Slow Query ({total_time:.3f}s): {statement[:100]}...")
-            elif app.config.get('DEBUG'):
-                logger.debug(f"Query Time: {total_time:.3f}s")
-        
-        # SQLite特殊配置
-        @event.listens_for(Engine, "connect")
-        def set_sqlite_pragma(dbapi_connection, connection_record):
-            """SQLite连接时的配置"""
-            if isinstance(dbapi_connection, sqlite3.Connection):
-                cursor = dbapi_connection.cursor()
-                # 启用外键约束
-                cursor.execute("PRAGMA foreign_keys=ON")
-                # 设置WAL模式提高并发性能
-                cursor.execute("PRAGMA journal_mode=WAL")
-                # 设置同步模式
-                cursor.execute("PRAGMA synchronous=NORMAL")
-                # 设置缓存大小
-                cursor.execute("PRAGMA cache_size=10000")
-                cursor.close()
+            @event.listens_for(Engine, "after_cursor_execute")
+            def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                """SQL执行后检查是否为慢查询"""
+                elapsed_ns = perf_counter_ns() - context._query_start_ns
+                if elapsed_ns > slow_threshold_ns:
+                    logger.warning("Slow Query (%.3fs): %s...", elapsed_ns / 1e9, statement[:100])
+        
+        # SQLite特殊配置，只在使用SQLite时注册连接监听器
+        if str(app.config.get('SQLALCHEMY_DATABASE_URI', '')).startswith('sqlite'):
+            @event.listens_for(Engine, "connect")
+            def set_sqlite_pragma(dbapi_connection, connection_record):
+                """SQLite连接时的配置"""
+                dbapi_connection.executescript(_SQLITE_PRAGMAS)
+    
+    def _start_log_writer(self, app):
+        """
+        启动操作日志后台写入线程
+        
+        写入线程使用独立的会话，不依赖Flask应用上下文。
+        
+        Args:
+            app: Flask应用实例
+        """
+        from src.models import _log_writer
+        
+        with app.app_context():
+            session_factory = sessionmaker(bind=db.engine)
+        
+        _log_writer.start(
+            session_factory,
+            commit_delay_ms=app.config.get('LOG_COMMIT_DELAY_MS', 5),
+            commit_siblings=app.config.get('LOG_COMMIT_SIBLINGS', 32),
+            max_batch=app.config.get('LOG_MAX_BATCH', 1000)
+        )
     
     def _register_context_processors(self, app):
         """
@@ -126,10 +252,8 @@ class DatabaseConfig:
         """
         with app.app_context():
             # 导入所有模型以确保表被创建
-            from src.models import (
-                User, Prompt, PromptVersion, Tag, PromptTag,
-                PromptCollaborator, TestRecord, SystemConfig, OperationLog
-            )
+            from src.models import load_all_models
+            load_all_models()
             
             # 创建所有表
             db.create_all()
@@ -150,53 +274,21 @@ class DatabaseConfig:
         logger = get_logger('database')
         
         try:
-            # 创建默认系统配置
-            default_configs = [
-                {
-                    'config_key': 'system.version',
-                    'config_value': '1.0.0',
-                    'config_type': 'string',
-                    'description': '系统版本号',
-                    'is_public': True
-                },
-                {
-                    'config_key': 'system.name',
-                    'config_value': 'Prompt Manager',
-                    'config_type': 'string',
-                    'description': '系统名称',
-                    'is_public': True
-                },
-                {
-                    'config_key': 'ui.theme',
-                    'config_value': 'light',
-                    'config_type': 'string',
-                    'description': '默认UI主题',
-                    'is_public': True
-                },
-                {
-                    'config_key': 'features.collaboration',
-                    'config_value': 'true',
-                    'config_type': 'boolean',
-                    'description': '是否启用协作功能',
-                    'is_public': True
-                },
-                {
-                    'config_key': 'features.ai_testing',
-                    'config_value': 'true',
-                    'config_type': 'boolean',
-                    'description': '是否启用AI测试功能',
-                    'is_public': True
-                }
-            ]
+            # 一次查询取出已存在的配置键，在内存中筛出缺失的默认配置
+            keys = [config_data['config_key'] for config_data in _DEFAULT_SYSTEM_CONFIGS]
+            existing = frozenset(
+                row.config_key for row in SystemConfig.query.with_entities(
+                    SystemConfig.config_key
+                ).filter(SystemConfig.config_key.in_(keys)).all()
+            )
             
-            for config_data in default_configs:
-                existing = SystemConfig.query.filter_by(
-                    config_key=config_data['config_key']
-                ).first()
-                
-                if not existing:
-                    config = SystemConfig(**config_data)
-                    db.session.add(config)
+            # 复制一份再插入，避免修改模块级常量
+            missing = [
+                dict(config_data) for config_data in _DEFAULT_SYSTEM_CONFIGS
+                if config_data['config_key'] not in existing
+            ]
+            if missing:
+                db.session.bulk_insert_mappings(SystemConfig, missing)
             
             # 提交系统配置
             db.session.commit()
@@ -204,7 +296,7 @@ class DatabaseConfig:
             
         except Exception as e:
             db.session.rollback()
-            logger.error(f"创建初始数据失败: {str(e)}")
+            logger.error("创建初始数据失败: %s", e)
             raise
     
     def drop_tables(self, app):
@@ -240,21 +332,46 @@ class DatabaseConfig:
             # 获取数据库连接信息
             engine = db.engine
             
+            if self._cached_url_str is None:
+                self._cached_url_str = engine.url.render_as_string(hide_password=True)
+            
+            pool = engine.pool
             info = {
-                'database_url': str(engine.url).replace(engine.url.password or '', '***'),
+                'database_url': self._cached_url_str,
                 'driver': engine.dialect.name,
-                'pool_size': engine.pool.size(),
-                'checked_in': engine.pool.checkedin(),
-                'checked_out': engine.pool.checkedout(),
-                'overflow': engine.pool.overflow(),
-                'invalid': engine.pool.invalid()
+                'pool_status': pool.status()
             }
             
+            # 只有QueuePool提供容量统计，StaticPool等连接池没有这些方法
+            if hasattr(pool, 'size'):
+                info.update({
+                    'pool_size': pool.size(),
+                    'checked_in': pool.checkedin(),
+                    'checked_out': pool.checkedout(),
+                    'overflow': pool.overflow()
+                })
+            
             return info
             
         except Exception as e:
             return {'error': str(e)}
     
+    def cached_health_check(self):
+        """
+        带短时缓存的数据库健康检查
+        
+        Returns:
+            dict: 健康检查结果
+        """
+        now = time.monotonic()
+        cache = self._health_cache
+        if cache is not None and cache[0] > now:
+            return cache[1]
+        
+        result = self.health_check()
+        self._health_cache = (now + _HEALTH_CACHE_TTL, result)
+        return result
+    
     def health_check(self):
         """
         数据库健康检查
@@ -264,7 +381,7 @@ class DatabaseConfig:
         """
         try:
             # 执行简单查询测试连接
-            result = db.session.execute('SELECT 1').scalar()
+            result = db.session.execute(_PING_STMT).scalar()
             
             if result == 1:
                 return {
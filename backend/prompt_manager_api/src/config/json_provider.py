@@ -0,0 +1,139 @@
+"""
+JSON序列化配置模块
+
+使用orjson替换Flask默认的标准库json，jsonify和请求体解析都在C层完成。
+orjson为可选依赖，未安装时保留Flask默认实现。
+"""
+
+import json
+from types import MappingProxyType
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    基于orjson的JSON提供者
+    
+    datetime、UUID、dataclass由orjson原生处理；
+    模型实例通过__json__转换，其余类型交给Flask默认的转换函数。
+    """
+    
+    @staticmethod
+    def _default(obj):
+        """
+        orjson无法直接序列化的对象的转换函数
+        
+        Args:
+            obj: 待序列化的对象
+        
+        Returns:
+            可被orjson序列化的对象
+        """
+        to_json = getattr(obj, '__json__', None)
+        if to_json is not None:
+            return to_json()
+        
+        if isinstance(obj, MappingProxyType):
+            return dict(obj)
+        
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        
+        return DefaultJSONProvider.default(obj)
+    
+    def _dumps_bytes(self, obj, indent=False):
+        """
+        序列化为UTF-8编码的JSON字节串
+        
+        Args:
+            obj: 待序列化的对象
+            indent (bool): 是否缩进输出
+        
+        Returns:
+            bytes: JSON字节串
+        """
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self._default, option=option)
+    
+    def dumps(self, obj, **kwargs):
+        """
+        序列化为JSON字符串
+        
+        Args:
+            obj: 待序列化的对象
+            **kwargs: 为兼容接口保留，只识别indent
+        
+        Returns:
+            str: JSON字符串
+        """
+        return self._dumps_bytes(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        """
+        构建JSON响应，jsonify最终调用此方法
+        
+        orjson输出的字节串直接作为响应体，不再经过str解码和重新编码。
+        缩进规则与Flask一致：compact为None时只在调试模式下缩进。
+        
+        Returns:
+            Response: JSON响应对象
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(
+            self._dumps_bytes(obj, indent=indent),
+            mimetype=self.mimetype
+        )
+    
+    def loads(self, s, **kwargs):
+        """
+        解析JSON字符串
+        
+        Args:
+            s (str | bytes): JSON文本
+            **kwargs: 为兼容接口保留，orjson不使用
+        
+        Returns:
+            解析得到的对象
+        """
+        return orjson.loads(s)
+
+
+def raw_json(text):
+    """
+    包装一段已经序列化好的JSON文本，嵌入到响应数据中
+    
+    orjson支持Fragment时原样拼接进输出，不再解析和重新序列化；
+    否则解析为Python对象，由当前的JSON提供者正常序列化。
+    
+    Args:
+        text (str): JSON文本
+    
+    Returns:
+        orjson.Fragment或解析得到的对象
+    """
+    fragment = getattr(orjson, 'Fragment', None)
+    if fragment is not None:
+        return fragment(text)
+    return json.loads(text)
+
+
+def init_json_provider(app):
+    """
+    为应用注册JSON提供者
+    
+    Args:
+        app: Flask应用实例
+    """
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
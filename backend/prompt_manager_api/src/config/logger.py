@@ -5,10 +5,23 @@
 这个模块体现了日志管理的艺术：既要详细记录又要性能优化。
 """
 
+import atexit
 import os
+import queue
 import logging
 import logging.handlers
-from datetime import datetime
+
+# 详细的日志格式，便于调试和问题追踪
+_LOG_FORMAT = (
+    '%(asctime)s - %(name)s - %(levelname)s - '
+    '%(filename)s:%(lineno)d - %(funcName)s() - %(message)s'
+)
+
+# 时间格式
+_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 所有处理器共用的格式器
+_FORMATTER = logging.Formatter(_LOG_FORMAT, _DATE_FORMAT)
 
 
 class LoggerConfig:
@@ -28,6 +41,9 @@ class LoggerConfig:
         """
         self.config = config
         self.logger = None
+        self._listener = None
+        # 是否在数据库操作和用户操作日志中记录数据内容（如更新前后的数据）
+        self.log_payloads = bool(getattr(config, 'LOG_DB_PAYLOADS', False))
         self._setup_logger()
     
     def _setup_logger(self):
@@ -39,7 +55,10 @@ class LoggerConfig:
         """
         # 创建主日志器
         self.logger = logging.getLogger('prompt_manager')
-        self.logger.setLevel(getattr(logging, self.config.LOG_LEVEL.upper()))
+        
+        # 日志级别只解析一次，文件处理器复用
+        self._level = logging.getLevelName(self.config.LOG_LEVEL.upper())
+        self.logger.setLevel(self._level)
         
         # 避免重复添加处理器
         if self.logger.handlers:
@@ -55,15 +74,55 @@ class LoggerConfig:
             console_handler.setFormatter(formatter)
             self.logger.addHandler(console_handler)
         
-        # 添加文件处理器（用于持久化存储）
+        # 创建文件处理器（用于持久化存储）
         file_handler = self._create_file_handler()
         file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
         
-        # 添加错误日志处理器（单独记录错误）
+        # 创建错误日志处理器（单独记录错误）
         error_handler = self._create_error_handler()
         error_handler.setFormatter(formatter)
-        self.logger.addHandler(error_handler)
+        
+        # 文件写入交给后台线程：请求线程只把日志记录放入队列，
+        # 由QueueListener在后台线程中写入文件，并按各处理器的级别过滤
+        self._file_handlers = (file_handler, error_handler)
+        self._queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        self.logger.addHandler(self._queue_handler)
+        self._start_listener()
+        
+        # 进程退出前写完队列中剩余的日志
+        atexit.register(self._stop_listener)
+        
+        # fork出的子进程（如gunicorn --preload的worker）不会继承监听线程，需要重新启动
+        os.register_at_fork(after_in_child=self._restart_listener)
+    
+    def _start_listener(self):
+        """
+        启动后台线程，把队列中的日志记录写入文件处理器
+        """
+        self._listener = logging.handlers.QueueListener(
+            self._queue_handler.queue,
+            *self._file_handlers,
+            respect_handler_level=True
+        )
+        self._listener.start()
+    
+    def _stop_listener(self):
+        """
+        停止当前的监听线程，写完队列中剩余的日志
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+    
+    def _restart_listener(self):
+        """
+        fork后在子进程中重新启动监听线程
+        
+        父进程的监听线程不存在于子进程中，继承的队列无人读取；
+        换用新队列，避免与父进程重复写入fork前尚未写出的记录。
+        """
+        self._queue_handler.queue = queue.SimpleQueue()
+        self._start_listener()
     
     def _create_formatter(self):
         """
@@ -74,22 +133,13 @@ class LoggerConfig:
         Returns:
             logging.Formatter: 格式器对象
         """
-        # 详细的日志格式，便于调试和问题追踪
-        log_format = (
-            '%(asctime)s - %(name)s - %(levelname)s - '
-            '%(filename)s:%(lineno)d - %(funcName)s() - %(message)s'
-        )
-        
-        # 时间格式
-        date_format = '%Y-%m-%d %H:%M:%S'
-        
-        return logging.Formatter(log_format, date_format)
+        return _FORMATTER
     
     def _create_file_handler(self):
         """
         创建文件处理器
         
-        配置日志文件的轮转和大小限制。
+        配置日志文件按天轮转。
         
         Returns:
             logging.Handler: 文件处理器
@@ -99,19 +149,16 @@ class LoggerConfig:
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir, exist_ok=True)
         
-        # 生成带日期的日志文件名
-        log_file = self._generate_log_filename(self.config.LOG_FILE_PATH)
-        
-        # 创建轮转文件处理器
-        # 当文件大小超过限制时自动创建新文件
-        handler = logging.handlers.RotatingFileHandler(
-            filename=log_file,
-            maxBytes=self.config.LOG_MAX_SIZE,
+        # 创建按天轮转的文件处理器
+        # 每天零点把当前文件改名为带日期后缀的归档文件，并继续写入新文件
+        handler = logging.handlers.TimedRotatingFileHandler(
+            filename=self.config.LOG_FILE_PATH,
+            when='midnight',
             backupCount=self.config.LOG_BACKUP_COUNT,
             encoding='utf-8'
         )
         
-        handler.setLevel(getattr(logging, self.config.LOG_LEVEL.upper()))
+        handler.setLevel(self._level)
         
         return handler
     
@@ -124,16 +171,14 @@ class LoggerConfig:
         Returns:
             logging.Handler: 错误日志处理器
         """
-        # 生成错误日志文件名
-        error_log_file = self._generate_log_filename(
-            self.config.LOG_FILE_PATH, 
-            suffix='_error'
-        )
+        # 错误日志文件名：在主日志文件名后加_error后缀
+        base_path, ext = os.path.splitext(self.config.LOG_FILE_PATH)
+        error_log_file = f"{base_path}_error{ext}"
         
-        # 创建错误日志处理器
-        handler = logging.handlers.RotatingFileHandler(
+        # 创建按天轮转的错误日志处理器
+        handler = logging.handlers.TimedRotatingFileHandler(
             filename=error_log_file,
-            maxBytes=self.config.LOG_MAX_SIZE,
+            when='midnight',
             backupCount=self.config.LOG_BACKUP_COUNT,
             encoding='utf-8'
         )
@@ -143,32 +188,6 @@ class LoggerConfig:
         
         return handler
     
-    def _generate_log_filename(self, base_path, suffix=''):
-        """
-        生成带日期的日志文件名
-        
-        按照要求的格式生成日志文件名：prompt_project_log.YYYY/MM/DD
-        
-        Args:
-            base_path (str): 基础路径
-            suffix (str): 文件名后缀
-            
-        Returns:
-            str: 完整的日志文件路径
-        """
-        # 获取当前日期
-        now = datetime.now()
-        date_str = now.strftime('%Y/%m/%d')
-        
-        # 分离路径和文件名
-        dir_path = os.path.dirname(base_path)
-        base_name = os.path.splitext(os.path.basename(base_path))[0]
-        
-        # 构建新的文件名
-        new_filename = f"{base_name}{suffix}.{date_str.replace('/', '_')}.log"
-        
-        return os.path.join(dir_path, new_filename)
-    
     def get_logger(self, name=None):
         """
         获取日志器实例
@@ -194,6 +213,11 @@ class LoggerConfig:
             response_status (int): 响应状态码
             response_time (float): 响应时间（毫秒）
         """
+        # 根据状态码选择日志级别，级别未启用时不构建日志内容
+        level = logging.WARNING if response_status and response_status >= 400 else logging.INFO
+        if not self.logger.isEnabledFor(level):
+            return
+        
         # 构建请求日志信息
         log_data = {
             'method': request.method,
@@ -209,17 +233,13 @@ class LoggerConfig:
         if response_time:
             log_data['response_time'] = f"{response_time:.2f}ms"
         
-        # 根据状态码选择日志级别
-        if response_status and response_status >= 400:
-            self.logger.warning(f"HTTP Request: {log_data}")
-        else:
-            self.logger.info(f"HTTP Request: {log_data}")
+        self.logger.log(level, "HTTP Request: %s", log_data)
     
     def log_database_operation(self, operation, table, record_id=None, details=None):
         """
         记录数据库操作日志
         
-        专门用于记录数据库CRUD操作。
+        专门用于记录数据库CRUD操作，属于调试信息，只在DEBUG级别输出。
         
         Args:
             operation (str): 操作类型（CREATE, READ, UPDATE, DELETE）
@@ -227,6 +247,9 @@ class LoggerConfig:
             record_id: 记录ID
             details (dict): 操作详情
         """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        
         log_data = {
             'operation': operation,
             'table': table,
@@ -234,7 +257,7 @@ class LoggerConfig:
             'details': details or {}
         }
         
-        self.logger.info(f"Database Operation: {log_data}")
+        self.logger.debug("Database Operation: %s", log_data)
     
     def log_ai_request(self, model, prompt_length, response_length=None, 
                       response_time=None, error=None):
@@ -250,6 +273,9 @@ class LoggerConfig:
             response_time (float): 响应时间（毫秒）
             error (str): 错误信息
         """
+        if not self.logger.isEnabledFor(logging.ERROR if error else logging.INFO):
+            return
+        
         log_data = {
             'model': model,
             'prompt_length': prompt_length,
@@ -259,9 +285,9 @@ class LoggerConfig:
         
         if error:
             log_data['error'] = error
-            self.logger.error(f"AI Request Failed: {log_data}")
+            self.logger.error("AI Request Failed: %s", log_data)
         else:
-            self.logger.info(f"AI Request: {log_data}")
+            self.logger.info("AI Request: %s", log_data)
     
     def log_user_action(self, user_id, action, resource_type, resource_id=None, details=None):
         """
@@ -276,6 +302,9 @@ class LoggerConfig:
             resource_id: 资源ID
             details (dict): 操作详情
         """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
         log_data = {
             'user_id': user_id,
             'action': action,
@@ -284,7 +313,7 @@ class LoggerConfig:
             'details': details or {}
         }
         
-        self.logger.info(f"User Action: {log_data}")
+        self.logger.info("User Action: %s", log_data)
 
 
 # 全局日志器实例
@@ -340,6 +369,28 @@ def log_database_operation(*args, **kwargs):
         _logger_config.log_database_operation(*args, **kwargs)
 
 
+def db_logging_enabled():
+    """
+    数据库操作日志是否会输出
+    
+    调用方先检查，日志关闭时不必构建日志详情。
+    
+    Returns:
+        bool: 日志器已初始化且启用了DEBUG级别时返回True
+    """
+    return _logger_config is not None and _logger_config.logger.isEnabledFor(logging.DEBUG)
+
+
+def log_payloads_enabled():
+    """
+    操作日志是否记录数据内容
+    
+    Returns:
+        bool: 配置了LOG_DB_PAYLOADS时返回True
+    """
+    return _logger_config is not None and _logger_config.log_payloads
+
+
 def log_ai_request(*args, **kwargs):
     """记录AI请求日志的便捷函数"""
     if _logger_config:
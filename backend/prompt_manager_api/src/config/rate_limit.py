@@ -0,0 +1,146 @@
+"""
+登录限流模块
+
+按"客户端IP:账号"统计登录失败次数，失败次数达到MAX_LOGIN_ATTEMPTS后，
+在ACCOUNT_LOCKOUT_MINUTES内直接拒绝登录，不再查询数据库，也不再计算密码哈希。
+启用Redis时计数保存在Redis中，多进程共享；否则保存在进程内。
+"""
+
+import threading
+import time
+
+from src.config.cache import get_redis, CACHE_ERRORS
+
+# Redis中登录失败计数的键前缀
+_KEY_PREFIX = 'login_fail:'
+
+# 进程内计数的最大键数量，超过后先清理过期的键，仍然超过时丢弃最早的一半
+_MAX_LOCAL_KEYS = 100_000
+
+# 进程内计数：键 -> [失败次数, 过期时间]
+_local_failures = {}
+_lock = threading.Lock()
+
+
+def _settings():
+    """
+    读取限流配置
+    
+    Returns:
+        tuple: (最大失败次数, 锁定时间（秒）)
+    """
+    from src.config import config
+    
+    return config.MAX_LOGIN_ATTEMPTS, config.ACCOUNT_LOCKOUT_MINUTES * 60
+
+
+def login_key(remote_addr, username_or_email):
+    """
+    生成登录限流键
+    
+    Args:
+        remote_addr (str): 客户端IP
+        username_or_email (str): 用户名或邮箱
+    
+    Returns:
+        str: 限流键
+    """
+    return f"{remote_addr}:{username_or_email.lower()}"
+
+
+def is_login_blocked(key):
+    """
+    判断登录是否已被限流
+    
+    Args:
+        key (str): 限流键
+    
+    Returns:
+        bool: 失败次数已达到上限时返回True
+    """
+    max_attempts, _ = _settings()
+    
+    client = get_redis()
+    if client is not None:
+        try:
+            count = client.get(_KEY_PREFIX + key)
+            return count is not None and int(count) >= max_attempts
+        except CACHE_ERRORS:
+            pass
+    
+    entry = _local_failures.get(key)
+    if entry is None:
+        return False
+    if entry[1] <= time.monotonic():
+        _local_failures.pop(key, None)
+        return False
+    return entry[0] >= max_attempts
+
+
+def record_login_failure(key):
+    """
+    记录一次登录失败
+    
+    计数从第一次失败开始计时，锁定时间内的后续失败不延长过期时间。
+    
+    Args:
+        key (str): 限流键
+    """
+    _, lockout_seconds = _settings()
+    
+    client = get_redis()
+    if client is not None:
+        try:
+            redis_key = _KEY_PREFIX + key
+            # 键不存在时先创建并设置过期时间，再自增
+            pipe = client.pipeline()
+            pipe.set(redis_key, 0, ex=lockout_seconds, nx=True)
+            pipe.incr(redis_key)
+            pipe.execute()
+            return
+        except CACHE_ERRORS:
+            pass
+    
+    now = time.monotonic()
+    with _lock:
+        entry = _local_failures.get(key)
+        if entry is None or entry[1] <= now:
+            if len(_local_failures) >= _MAX_LOCAL_KEYS:
+                _evict_local(now)
+            _local_failures[key] = [1, now + lockout_seconds]
+        else:
+            entry[0] += 1
+
+
+def reset_login_failures(key):
+    """
+    登录成功后清除失败计数
+    
+    Args:
+        key (str): 限流键
+    """
+    client = get_redis()
+    if client is not None:
+        try:
+            client.delete(_KEY_PREFIX + key)
+        except CACHE_ERRORS:
+            pass
+    
+    _local_failures.pop(key, None)
+
+
+def _evict_local(now):
+    """
+    清理进程内计数，调用方需持有_lock
+    
+    Args:
+        now (float): 当前的monotonic时间
+    """
+    expired = [key for key, entry in _local_failures.items() if entry[1] <= now]
+    for key in expired:
+        del _local_failures[key]
+    
+    # 字典保持插入顺序，仍然超过上限时丢弃最早的一半
+    if len(_local_failures) >= _MAX_LOCAL_KEYS:
+        for key in list(_local_failures)[:_MAX_LOCAL_KEYS // 2]:
+            del _local_failures[key]
@@ -5,26 +5,53 @@ Prompt Manager API 主应用文件
 体现了应用架构的艺术：清晰的结构、优雅的初始化、完整的错误处理。
 """
 
+import json
 import os
+import stat
 import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from functools import lru_cache
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify, request
-from flask_cors import CORS
+from flask import Flask, Response, send_file, jsonify, request
 from werkzeug.exceptions import HTTPException
+from werkzeug.security import safe_join
+
+try:
+    from whitenoise import WhiteNoise
+except ImportError:  # whitenoise为可选依赖，未安装时由Flask视图提供静态文件
+    WhiteNoise = None
 
 # 导入配置
 from src.config import config
 from src.config.database import init_database, create_tables
+from src.config.json_provider import init_json_provider
 from src.config.logger import init_logger, get_logger
 
-# 导入所有模型以确保表被创建
-from src.models import (
-    User, Prompt, PromptVersion, Tag, PromptTag,
-    PromptCollaborator, TestRecord, SystemConfig, OperationLog
-)
+# 生产模式下500错误的响应体，模块加载时序列化一次
+_INTERNAL_ERROR_BODY = json.dumps(
+    {'error': True, 'code': 500, 'message': '服务器内部错误'},
+    ensure_ascii=False,
+    separators=(',', ':')
+).encode('utf-8')
+
+
+@lru_cache(maxsize=None)
+def _validate_config_once(config_object):
+    """
+    验证配置，同一配置对象只验证一次
+    
+    Args:
+        config_object: 配置对象
+        
+    Returns:
+        tuple: (是否有效, 错误列表)
+    """
+    return config_object.validate_config()
 
 
 def create_app(config_object=None):
@@ -49,8 +76,11 @@ def create_app(config_object=None):
     
     app.config.from_object(config_object)
     
+    # 使用orjson序列化响应
+    init_json_provider(app)
+    
     # 验证配置
-    is_valid, errors = config_object.validate_config()
+    is_valid, errors = _validate_config_once(config_object)
     if not is_valid:
         print("配置验证失败:")
         for error in errors:
@@ -67,6 +97,7 @@ def create_app(config_object=None):
     init_database(app)
     
     # 配置CORS（跨域资源共享）
+    from flask_cors import CORS
     CORS(app, origins=getattr(config_object, 'CORS_ORIGINS', ['*']))
     
     # 注册蓝图（路由）
@@ -78,23 +109,42 @@ def create_app(config_object=None):
     # 注册请求处理器
     register_request_handlers(app)
     
-    # 注册静态文件路由
+    # 注册静态文件中间件和路由
+    register_static_middleware(app)
     register_static_routes(app)
     
-    # 创建数据库表
-    with app.app_context():
-        try:
-            create_tables(app)
-            logger.info("数据库表创建完成")
-        except Exception as e:
-            logger.error(f"数据库表创建失败: {str(e)}")
-            if not config_object.DEBUG:
-                sys.exit(1)
+    # 注册命令行命令
+    register_cli_commands(app)
+    
+    # 创建数据库表，多进程部署时关闭，避免每个worker启动时都执行DDL
+    if app.config.get('RUN_MIGRATIONS', True):
+        with app.app_context():
+            try:
+                create_tables(app)
+                logger.info("数据库表创建完成")
+            except Exception as e:
+                logger.error(f"数据库表创建失败: {str(e)}")
+                if not config_object.DEBUG:
+                    sys.exit(1)
     
     logger.info("应用初始化完成")
     return app
 
 
+def register_cli_commands(app):
+    """
+    注册命令行命令
+    
+    Args:
+        app: Flask应用实例
+    """
+    @app.cli.command('init-db')
+    def init_db_command():
+        """创建数据库表和初始数据"""
+        create_tables(app)
+        print("数据库表创建完成")
+
+
 def register_blueprints(app):
     """
     注册蓝图（路由模块）
@@ -133,7 +183,7 @@ def register_error_handlers(app):
     @app.errorhandler(HTTPException)
     def handle_http_exception(e):
         """处理HTTP异常"""
-        logger.warning(f"HTTP异常: {e.code} - {e.description}")
+        logger.warning("HTTP异常: %s - %s", e.code, e.description)
         return jsonify({
             'error': True,
             'code': e.code,
@@ -143,9 +193,10 @@ def register_error_handlers(app):
     @app.errorhandler(Exception)
     def handle_general_exception(e):
         """处理一般异常"""
-        logger.error(f"未处理的异常: {str(e)}", exc_info=True)
+        # 未处理的异常必须保留调用栈，生产环境排查问题依赖它
+        logger.error("未处理的异常: %s", e, exc_info=True)
         
-        if app.config.get('DEBUG'):
+        if app.debug:
             # 调试模式下返回详细错误信息
             return jsonify({
                 'error': True,
@@ -154,12 +205,8 @@ def register_error_handlers(app):
                 'type': type(e).__name__
             }), 500
         else:
-            # 生产模式下返回通用错误信息
-            return jsonify({
-                'error': True,
-                'code': 500,
-                'message': '服务器内部错误'
-            }), 500
+            # 生产模式下返回预先序列化的通用错误信息
+            return Response(_INTERNAL_ERROR_BODY, status=500, mimetype='application/json')
 
 
 def register_request_handlers(app):
@@ -174,20 +221,168 @@ def register_request_handlers(app):
     @app.before_request
     def before_request():
         """请求前处理"""
-        # 记录请求开始时间
-        request.start_time = time.time()
+        # 记录请求开始时间，使用单调时钟的整数纳秒
+        request.start_ns = time.perf_counter_ns()
     
     @app.after_request
     def after_request(response):
         """请求后处理"""
         # 计算响应时间
-        if hasattr(request, 'start_time'):
-            response_time = (time.time() - request.start_time) * 1000
+        start_ns = getattr(request, 'start_ns', None)
+        if start_ns is not None:
+            response_time = (time.perf_counter_ns() - start_ns) / 1_000_000
             log_request(request, response.status_code, response_time)
         
         return response
 
 
+# 入口页面缓存：静态目录 -> (修改时间, 大小, 页面内容, ETag)
+_index_cache = {}
+
+
+@lru_cache(maxsize=1024)
+def _safe_static_path(static_folder, path):
+    """
+    把请求路径安全地拼接到静态目录下
+    
+    只做字符串处理，结果不依赖文件系统状态，可以按路径缓存。
+    
+    Args:
+        static_folder (str): 静态文件目录
+        path (str): 请求的相对路径
+        
+    Returns:
+        str: 文件路径，路径越出静态目录时返回None
+    """
+    return safe_join(static_folder, path)
+
+
+def _resolve_static(static_folder, path):
+    """
+    解析静态文件路径并生成ETag
+    
+    每次请求都用os.stat检查文件，新增或替换的文件无需重启即可生效；
+    ETag由修改时间和大小生成，文件变化后随之变化。
+    
+    Args:
+        static_folder (str): 静态文件目录
+        path (str): 请求的相对路径
+        
+    Returns:
+        tuple: (文件路径, ETag)，文件不存在或不是普通文件时返回None
+    """
+    fs_path = _safe_static_path(static_folder, path)
+    if fs_path is None:
+        return None
+    
+    try:
+        st = os.stat(fs_path)
+    except OSError:
+        return None
+    
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    
+    etag = f"{st.st_mtime_ns:x}-{st.st_size:x}-{zlib.adler32(path.encode()) & 0xffffffff:x}"
+    return fs_path, etag
+
+
+def _load_index(static_folder):
+    """
+    读取SPA入口页面
+    
+    页面内容缓存在内存中，每次用os.stat检查修改时间和大小，文件变化后重新读取。
+    
+    Args:
+        static_folder (str): 静态文件目录
+        
+    Returns:
+        tuple: (页面内容, ETag)，文件不存在时返回None
+    """
+    index_path = os.path.join(static_folder, 'index.html')
+    try:
+        st = os.stat(index_path)
+    except OSError:
+        _index_cache.pop(static_folder, None)
+        return None
+    
+    cached = _index_cache.get(static_folder)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2], cached[3]
+    
+    try:
+        with open(index_path, 'rb') as f:
+            content = f.read()
+    except OSError:
+        return None
+    
+    etag = f"{zlib.adler32(content) & 0xffffffff:x}-{len(content):x}"
+    _index_cache[static_folder] = (st.st_mtime_ns, st.st_size, content, etag)
+    return content, etag
+
+
+def _set_cache_headers(response, etag, max_age):
+    """
+    设置静态资源的ETag和缓存头
+    
+    Args:
+        response: 响应对象
+        etag (str): ETag值
+        max_age (int): 缓存时间（秒），为0时要求浏览器每次重新验证
+    """
+    response.set_etag(etag)
+    if max_age > 0:
+        response.cache_control.public = True
+    else:
+        response.cache_control.no_cache = True
+    response.cache_control.max_age = max_age
+
+
+def _static_headers(headers, path, url):
+    """
+    WhiteNoise的响应头回调，入口页面每次都要求浏览器重新验证
+    
+    Args:
+        headers: 响应头
+        path (str): 文件路径
+        url (str): 请求URL
+    """
+    if url.endswith('/index.html') or url == '/':
+        headers['Cache-Control'] = 'no-cache'
+
+
+def _is_immutable_asset(path, url):
+    """构建产物/assets/下的文件名带内容哈希，可以永久缓存"""
+    return url.startswith('/assets/')
+
+
+def register_static_middleware(app):
+    """
+    注册WhiteNoise静态文件中间件
+    
+    已存在的静态文件在WSGI层直接返回，不经过Flask路由；
+    支持预压缩的.gz/.br文件、ETag和Range请求。
+    未命中的请求（SPA路由等）继续交给serve_static处理。
+    
+    Args:
+        app: Flask应用实例
+    """
+    static_folder_path = app.static_folder
+    if WhiteNoise is None or static_folder_path is None or not os.path.isdir(static_folder_path):
+        return
+    
+    app.wsgi_app = WhiteNoise(
+        app.wsgi_app,
+        root=static_folder_path,
+        prefix='/',
+        index_file=True,
+        max_age=app.config.get('STATIC_MAX_AGE', 3600),
+        autorefresh=app.debug,
+        immutable_file_test=_is_immutable_asset,
+        add_headers_function=_static_headers
+    )
+
+
 def register_static_routes(app):
     """
     注册静态文件路由
@@ -195,6 +390,8 @@ def register_static_routes(app):
     Args:
         app: Flask应用实例
     """
+    max_age = app.config.get('STATIC_MAX_AGE', 3600)
+    
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
     def serve_static(path):
@@ -204,14 +401,30 @@ def register_static_routes(app):
         if static_folder_path is None:
             return jsonify({'error': '静态文件夹未配置'}), 404
         
-        # 如果请求的是具体文件且存在，直接返回
-        if path and os.path.exists(os.path.join(static_folder_path, path)):
-            return send_from_directory(static_folder_path, path)
+        # 如果请求的是具体文件且存在，直接返回；index.html统一走下方的入口页面逻辑
+        resolved = _resolve_static(static_folder_path, path) if path and path != 'index.html' else None
+        if resolved is not None:
+            fs_path, etag = resolved
+            
+            # 浏览器缓存的版本未变化，直接返回304
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                _set_cache_headers(response, etag, max_age)
+                return response
+            
+            return send_file(fs_path, etag=etag, max_age=max_age)
         
-        # 否则返回index.html（用于SPA应用）
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+        # 否则返回index.html（用于SPA应用），入口页面每次都要求浏览器重新验证
+        index = _load_index(static_folder_path)
+        if index is not None:
+            content, etag = index
+            
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = Response(content, mimetype='text/html')
+            _set_cache_headers(response, etag, 0)
+            return response
         
         # 如果index.html也不存在，返回API信息
         return jsonify({
@@ -238,28 +451,25 @@ def health_check():
     from src.config.database import database_config
     
     # 检查数据库连接
-    db_health = database_config.health_check()
+    db_health = database_config.cached_health_check()
     
     # 检查配置
     config_health = {
         'status': 'healthy',
-        'features': config.get_feature_flags()
+        'features': dict(config.get_feature_flags())
     }
     
     overall_status = 'healthy' if db_health['status'] == 'healthy' else 'unhealthy'
     
     return jsonify({
         'status': overall_status,
-        'timestamp': datetime.utcnow().isoformat(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
         'database': db_health,
         'config': config_health,
         'version': '1.0.0'
     })
 
 if __name__ == '__main__':
-    import time
-    from datetime import datetime
-    
     logger = get_logger()
     
     # 启动信息
@@ -9,16 +9,60 @@
 4. 完整注释 - 每个字段和方法都有详细说明
 """
 
-from src.models.base import BaseModel
-from src.models.user import User
-from src.models.prompt import Prompt
-from src.models.prompt_version import PromptVersion
-from src.models.tag import Tag
-from src.models.prompt_tag import PromptTag
-from src.models.prompt_collaborator import PromptCollaborator
-from src.models.test_record import TestRecord
-from src.models.system_config import SystemConfig
-from src.models.operation_log import OperationLog
+import importlib
+
+# 导出名称到所在子模块的映射
+# 模型在首次访问时才导入（PEP 562），只需要部分模型的进程不必加载全部模型及其依赖
+_LAZY_EXPORTS = {
+    'BaseModel': 'base',
+    'User': 'user',
+    'Prompt': 'prompt',
+    'PromptVersion': 'prompt_version',
+    'Tag': 'tag',
+    'PromptTag': 'prompt_tag',
+    'PromptCollaborator': 'prompt_collaborator',
+    'TestRecord': 'test_record',
+    'SystemConfig': 'system_config',
+    'OperationLog': 'operation_log',
+    'OperationType': 'operation_log',
+    'ResourceType': 'operation_log'
+}
+
+
+def __getattr__(name):
+    """
+    按需导入模型类
+    
+    Args:
+        name (str): 访问的属性名
+        
+    Returns:
+        导出的模型类或枚举
+    """
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module('src.models.' + module_name), name)
+    # 写回模块命名空间，后续访问不再经过__getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """列出包括尚未导入的模型在内的全部导出名称"""
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
+
+def load_all_models():
+    """
+    导入全部模型
+    
+    关系映射通过类名字符串互相引用，建表或配置映射前必须保证所有模型都已注册。
+    """
+    for name in _LAZY_EXPORTS:
+        __getattr__(name)
+
 
 # 导出所有模型类，方便其他模块导入
 __all__ = [
@@ -31,6 +75,9 @@ __all__ = [
     'PromptCollaborator',
     'TestRecord',
     'SystemConfig',
-    'OperationLog'
+    'OperationLog',
+    'OperationType',
+    'ResourceType',
+    'load_all_models'
 ]
 
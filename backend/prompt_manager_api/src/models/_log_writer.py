@@ -0,0 +1,208 @@
+"""
+操作日志后台写入模块
+
+操作日志先进入进程内的追加队列，由单个后台线程按批次合并写入数据库。
+设计参考PostgreSQL的commit_delay/commit_siblings：
+等待一小段时间让更多日志到达，把N次提交合并为一次提交。
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+# create_log入队后返回的标记对象
+QUEUED = object()
+
+# 通知写入线程退出的标记对象
+_STOP = object()
+
+_queue = queue.SimpleQueue()
+_lock = threading.Lock()
+_writer = None
+
+# 最近一次start的参数，fork出的子进程据此在自己的进程内重新启动写入线程
+_start_args = None
+
+logger = logging.getLogger('prompt_manager.log_writer')
+
+
+def enqueue(row):
+    """
+    将一条日志放入写入队列
+
+    Args:
+        row (dict): 日志字典
+
+    Returns:
+        object: 入队标记QUEUED
+    """
+    # fork出的子进程没有写入线程，首次入队时按父进程的参数启动
+    if _writer is None and _start_args is not None:
+        start(*_start_args)
+
+    _queue.put(row)
+    return QUEUED
+
+
+def start(session_factory, commit_delay_ms=5, commit_siblings=32, max_batch=1000):
+    """
+    启动后台写入线程
+
+    重复调用不会启动多个线程。
+
+    Args:
+        session_factory: 无参可调用对象，返回新的数据库会话
+        commit_delay_ms (int): 攒批等待时间，单位毫秒
+        commit_siblings (int): 攒够该数量的日志后立即写入
+        max_batch (int): 单批写入的最大日志数量
+    """
+    global _writer, _start_args
+
+    with _lock:
+        if _writer is not None and _writer.is_alive():
+            return
+
+        _start_args = (session_factory, commit_delay_ms, commit_siblings, max_batch)
+        _writer = threading.Thread(
+            target=_run,
+            args=(session_factory, commit_delay_ms / 1000.0, commit_siblings, max_batch),
+            name='operation-log-writer',
+            daemon=True
+        )
+        _writer.start()
+
+    atexit.register(flush_and_join)
+
+
+def flush_and_join(timeout=5.0):
+    """
+    写入队列中剩余的日志并等待写入线程退出
+
+    Args:
+        timeout (float): 最长等待时间，单位秒
+    """
+    global _writer, _start_args
+
+    with _lock:
+        writer, _writer = _writer, None
+        # 主动停止后不再由enqueue自动重启
+        _start_args = None
+
+    if writer is None or not writer.is_alive():
+        return
+
+    _queue.put(_STOP)
+    writer.join(timeout)
+
+
+def _reset_after_fork():
+    """
+    fork后在子进程中重置写入状态
+
+    子进程只继承了父进程的线程对象，没有继承线程本身；
+    换用新的队列和锁，写入线程在首次enqueue时重新启动。
+    父进程队列中尚未写入的日志由父进程负责，子进程中丢弃这份副本。
+    """
+    global _queue, _lock, _writer
+
+    _queue = queue.SimpleQueue()
+    _lock = threading.Lock()
+    _writer = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _run(session_factory, commit_delay, commit_siblings, max_batch):
+    """写入线程主循环"""
+    while True:
+        batch, stop = _collect_batch(commit_delay, commit_siblings, max_batch)
+
+        if batch:
+            _write_batch(session_factory, batch)
+
+        if stop:
+            return
+
+
+def _collect_batch(commit_delay, commit_siblings, max_batch):
+    """
+    收集一批待写入的日志
+
+    阻塞等待第一条日志，然后在commit_delay内继续攒批，
+    攒够commit_siblings条时提前结束等待，最后取走已到达的日志直至max_batch。
+
+    Returns:
+        tuple: (日志列表, 是否收到退出标记)
+    """
+    item = _queue.get()
+    if item is _STOP:
+        return [], True
+
+    batch = [item]
+    deadline = time.monotonic() + commit_delay
+
+    while len(batch) < max_batch:
+        if len(batch) < commit_siblings:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        else:
+            try:
+                item = _queue.get_nowait()
+            except queue.Empty:
+                break
+
+        if item is _STOP:
+            return batch, True
+        batch.append(item)
+
+    return batch, False
+
+
+def _write_batch(session_factory, batch):
+    """
+    在独立会话中写入并提交一批日志
+
+    整批提交失败时二分重试，最终只丢弃单独写入也失败的日志，
+    不影响同批次中其他请求的日志。
+    """
+    error = _try_write(session_factory, batch)
+    if error is None:
+        return
+
+    if len(batch) == 1:
+        logger.error("操作日志写入失败，丢弃1条日志: %r", batch[0], exc_info=error)
+        return
+
+    middle = len(batch) // 2
+    _write_batch(session_factory, batch[:middle])
+    _write_batch(session_factory, batch[middle:])
+
+
+def _try_write(session_factory, batch):
+    """
+    写入并提交一批日志
+
+    Returns:
+        Exception: 写入失败时的异常，成功时返回None
+    """
+    from src.models.operation_log import OperationLog
+
+    session = session_factory()
+    try:
+        OperationLog.bulk_create_logs(session, batch)
+        session.commit()
+        return None
+    except Exception as e:
+        session.rollback()
+        return e
+    finally:
+        session.close()
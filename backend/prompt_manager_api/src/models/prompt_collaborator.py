@@ -5,7 +5,8 @@
 支持多用户协作编辑提示词，包含权限管理功能。
 """
 
-from sqlalchemy import Column, Integer, ForeignKey, JSON
+from sqlalchemy import Column, Integer, SmallInteger, ForeignKey, JSON, Index, CheckConstraint
+from sqlalchemy.ext.hybrid import hybrid_method
 from sqlalchemy.orm import relationship
 from src.models.base import BaseModel
 
@@ -19,6 +20,16 @@ class PromptCollaborator(BaseModel):
     """
     
     __tablename__ = 'prompt_collaborators'
+    __table_args__ = (
+        # 权限检查按提示词、用户和状态查找协作者
+        Index('ix_pc_prompt_user_status', 'prompt_id', 'user_id', 'status'),
+        # 按用户统计、列出参与协作的提示词
+        Index('ix_pc_user_status', 'user_id', 'status'),
+        # 按角色筛选提示词的协作者
+        Index('ix_pc_prompt_role', 'prompt_id', 'role'),
+        CheckConstraint('role BETWEEN 1 AND 3', name='ck_pc_role'),
+        CheckConstraint('status IN (-1, 0, 1)', name='ck_pc_status'),
+    )
     
     # === 关联字段 ===
     prompt_id = Column(
@@ -37,7 +48,7 @@ class PromptCollaborator(BaseModel):
     
     # === 权限字段 ===
     role = Column(
-        Integer,
+        SmallInteger,
         nullable=False,
         default=2,
         comment='角色：1-所有者，2-编辑者，3-查看者'
@@ -71,7 +82,7 @@ class PromptCollaborator(BaseModel):
     
     # === 状态字段 ===
     status = Column(
-        Integer,
+        SmallInteger,
         nullable=False,
         default=1,
         comment='状态：1-正常，0-待接受，-1-已拒绝'
@@ -95,35 +106,45 @@ class PromptCollaborator(BaseModel):
     )
     
     # === 角色权限方法 ===
+    # 判断方法均为hybrid_method：实例上返回布尔值，类上返回SQL条件，
+    # 如 query.filter(PromptCollaborator.can_edit())
+    @hybrid_method
     def is_owner(self):
         """是否为所有者"""
         return self.role == 1
     
+    @hybrid_method
     def is_editor(self):
         """是否为编辑者"""
         return self.role == 2
     
+    @hybrid_method
     def is_viewer(self):
         """是否为查看者"""
         return self.role == 3
     
+    @hybrid_method
     def can_edit(self):
         """是否有编辑权限"""
         return self.role <= 2
     
+    @hybrid_method
     def can_view(self):
         """是否有查看权限"""
         return self.role <= 3
     
     # === 状态管理方法 ===
+    @hybrid_method
     def is_active(self):
         """是否为活跃状态"""
         return self.status == 1
     
+    @hybrid_method
     def is_pending(self):
         """是否为待接受状态"""
         return self.status == 0
     
+    @hybrid_method
     def is_rejected(self):
         """是否已拒绝"""
         return self.status == -1
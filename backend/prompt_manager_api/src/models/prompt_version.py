@@ -5,9 +5,11 @@
 版本模型是版本控制系统的核心，记录了提示词的每一次变更历史。
 """
 
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
-from src.models.base import BaseModel
+import copy
+import difflib
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Boolean, Index, event, func, select, literal, text, inspect
+from sqlalchemy.orm import relationship, aliased, object_session, validates, deferred
+from src.models.base import BaseModel, calculate_content_hash
 
 
 class PromptVersion(BaseModel):
@@ -30,6 +32,21 @@ class PromptVersion(BaseModel):
     """
     
     __tablename__ = 'prompt_versions'
+    __table_args__ = (
+        # 同一提示词下版本号唯一，按版本号查找版本时直接命中
+        Index('ix_pv_prompt_version', 'prompt_id', 'version_number', unique=True),
+        # 只索引当前版本，查找提示词的当前版本时走这个小索引
+        Index(
+            'ix_pv_prompt_current',
+            'prompt_id',
+            postgresql_where=text('is_current'),
+            sqlite_where=text('is_current')
+        ),
+    )
+    
+    # to_dict结果缓存，按参数组合保存；版本内容不可变，只有当前状态变化时清空。
+    # 测试次数会随测试记录增加而变化，不进入缓存
+    _dict_cache = None
     
     # === 关联字段 ===
     prompt_id = Column(
@@ -52,11 +69,12 @@ class PromptVersion(BaseModel):
         comment='版本标题，记录当时的标题'
     )
     
-    content = Column(
+    # 内容字段延迟加载，版本历史列表不传输完整快照
+    content = deferred(Column(
         Text,
         nullable=False,
         comment='版本内容，完整的内容快照'
-    )
+    ))
     
     content_hash = Column(
         String(64),
@@ -86,6 +104,13 @@ class PromptVersion(BaseModel):
         comment='父版本ID，用于构建版本树结构'
     )
     
+    ancestry_path = Column(
+        String(1024),
+        nullable=True,
+        index=True,
+        comment='祖先路径，如/1/4/17/，插入时自动生成，用于判断祖先和查询子树'
+    )
+    
     # === 状态字段 ===
     is_current = Column(
         Boolean,
@@ -114,7 +139,7 @@ class PromptVersion(BaseModel):
         backref='child_versions'
     )
     
-    # 一对多：一个版本可能有多个测试记录
+    # 一对多：一个版本可能有多个测试记录（只追加、数量大，保持按需查询）
     test_records = relationship(
         'TestRecord',
         back_populates='prompt_version',
@@ -122,6 +147,23 @@ class PromptVersion(BaseModel):
         lazy='dynamic'
     )
     
+    # === 内容同步方法 ===
+    @validates('content')
+    def _sync_content_hash(self, key, value):
+        """
+        内容赋值时同步更新哈希值
+        
+        同时记下校验结果，validate_content_hash不必再重新计算。
+        """
+        if value is None:
+            self.content_hash = None
+            return value
+        
+        content_hash = calculate_content_hash(value)
+        self.content_hash = content_hash
+        self._hash_check = (value, content_hash, True)
+        return value
+    
     # === 版本比较方法 ===
     def compare_with(self, other_version):
         """
@@ -158,7 +200,14 @@ class PromptVersion(BaseModel):
         Returns:
             dict: 内容差异信息
         """
-        import difflib
+        # 哈希相同说明内容一致，无需计算差异
+        if self.content_hash == other_version.content_hash:
+            return {
+                'diff_lines': [],
+                'added_lines': 0,
+                'removed_lines': 0,
+                'has_changes': False
+            }
         
         # 按行分割内容
         self_lines = self.content.splitlines(keepends=True)
@@ -173,46 +222,108 @@ class PromptVersion(BaseModel):
             lineterm=''
         ))
         
+        # 一次遍历统计新增和删除的行数
+        added = removed = 0
+        for line in diff:
+            first = line[:1]
+            if first == '+':
+                if not line.startswith('+++'):
+                    added += 1
+            elif first == '-':
+                if not line.startswith('---'):
+                    removed += 1
+        
         return {
             'diff_lines': diff,
-            'added_lines': len([line for line in diff if line.startswith('+') and not line.startswith('+++')]),
-            'removed_lines': len([line for line in diff if line.startswith('-') and not line.startswith('---')]),
+            'added_lines': added,
+            'removed_lines': removed,
             'has_changes': len(diff) > 0
         }
     
     # === 版本树方法 ===
-    def get_ancestors(self):
+    def get_ancestors(self, session=None):
         """
         获取所有祖先版本
         
+        使用递归CTE一次查询取回整条祖先链，而不是逐级加载parent_version。
+        
+        Args:
+            session: 数据库会话，默认使用当前对象所在的会话
+            
         Returns:
-            list: 祖先版本列表，按时间倒序排列
+            list: 祖先版本列表，按时间倒序排列（最近的父版本在前）
         """
-        ancestors = []
-        current = self.parent_version
+        session = session or object_session(self)
+        if session is None or self.id is None:
+            return []
         
-        while current:
-            ancestors.append(current)
-            current = current.parent_version
+        parent = aliased(PromptVersion)
+        tree = select(
+            PromptVersion.parent_version_id.label('id'),
+            literal(1).label('depth')
+        ).where(
+            PromptVersion.id == self.id,
+            PromptVersion.parent_version_id.isnot(None)
+        ).cte('ancestors', recursive=True)
+        tree = tree.union_all(
+            select(parent.parent_version_id, tree.c.depth + 1).where(
+                parent.id == tree.c.id,
+                parent.parent_version_id.isnot(None)
+            )
+        )
         
-        return ancestors
+        stmt = (
+            select(PromptVersion)
+            .join(tree, PromptVersion.id == tree.c.id)
+            .order_by(tree.c.depth)
+        )
+        return list(session.scalars(stmt))
     
-    def get_descendants(self):
+    def get_descendants(self, session=None):
         """
         获取所有后代版本
         
+        有祖先路径时按路径前缀做一次索引查询，
+        否则使用递归CTE一次查询取回整棵子树。
+        
+        Args:
+            session: 数据库会话，默认使用当前对象所在的会话
+            
         Returns:
-            list: 后代版本列表
+            list: 后代版本列表，按层级排列
         """
-        descendants = []
+        session = session or object_session(self)
+        if session is None or self.id is None:
+            return []
+        
+        if self.ancestry_path is not None:
+            prefix = f'{self.ancestry_path}{self.id}/'
+            stmt = (
+                select(PromptVersion)
+                .where(PromptVersion.ancestry_path.like(f'{prefix}%'))
+                .order_by(func.length(PromptVersion.ancestry_path), PromptVersion.id)
+            )
+            return list(session.scalars(stmt))
         
-        def collect_descendants(version):
-            for child in version.child_versions:
-                descendants.append(child)
-                collect_descendants(child)
+        child = aliased(PromptVersion)
+        tree = select(
+            PromptVersion.id,
+            literal(1).label('depth')
+        ).where(
+            PromptVersion.parent_version_id == self.id
+        ).cte('descendants', recursive=True)
+        tree = tree.union_all(
+            select(child.id, tree.c.depth + 1).where(
+                child.parent_version_id == tree.c.id
+            )
+        )
         
-        collect_descendants(self)
-        return descendants
+        stmt = (
+            select(PromptVersion)
+            .join(tree, PromptVersion.id == tree.c.id)
+            .order_by(tree.c.depth, PromptVersion.id)
+        )
+        return list(session.scalars(stmt))
     
     def is_ancestor_of(self, other_version):
         """
@@ -224,6 +335,11 @@ class PromptVersion(BaseModel):
         Returns:
             bool: 是否为祖先版本
         """
+        # 有祖先路径时直接做子串判断，无需访问数据库
+        path = other_version.ancestry_path
+        if path is not None and self.id is not None:
+            return f'/{self.id}/' in path
+        
         current = other_version.parent_version
         
         while current:
@@ -254,10 +370,12 @@ class PromptVersion(BaseModel):
         应该在服务层处理。
         """
         self.is_current = True
+        self._dict_cache = None
     
     def unset_as_current(self):
         """取消当前版本状态"""
         self.is_current = False
+        self._dict_cache = None
     
     # === 统计方法 ===
     def get_test_count(self):
@@ -267,7 +385,7 @@ class PromptVersion(BaseModel):
         Returns:
             int: 测试次数
         """
-        return self.test_records.count()
+        return self.test_records.order_by(None).with_entities(func.count()).scalar()
     
     def get_latest_test(self):
         """
@@ -276,7 +394,11 @@ class PromptVersion(BaseModel):
         Returns:
             TestRecord: 最新的测试记录，如果没有则返回None
         """
-        return self.test_records.order_by('created_at desc').first()
+        from src.models.test_record import TestRecord
+        
+        return self.test_records.order_by(
+            TestRecord.created_at.desc(), TestRecord.id.desc()
+        ).first()
     
     # === 验证方法 ===
     def validate_version_number(self):
@@ -291,11 +413,10 @@ class PromptVersion(BaseModel):
         
         # 检查是否与同一提示词的其他版本冲突
         if self.prompt:
-            existing = self.prompt.versions.filter_by(
-                version_number=self.version_number
-            ).filter(PromptVersion.id != self.id).first()
-            
-            return existing is None
+            return not any(
+                version.version_number == self.version_number and version is not self
+                for version in self.prompt.versions
+            )
         
         return True
     
@@ -303,26 +424,47 @@ class PromptVersion(BaseModel):
         """
         验证内容哈希值是否正确
         
+        校验结果按内容对象缓存在实例上，内容和哈希值都未变化时不再重复计算。
+        
         Returns:
             bool: 哈希值是否正确
         """
-        import hashlib
-        expected_hash = hashlib.sha256(self.content.encode('utf-8')).hexdigest()
-        return self.content_hash == expected_hash
+        content = self.content
+        content_hash = self.content_hash
+        
+        cached = getattr(self, '_hash_check', None)
+        if cached is not None and cached[0] is content and cached[1] == content_hash:
+            return cached[2]
+        
+        is_valid = content_hash == calculate_content_hash(content)
+        self._hash_check = (content, content_hash, is_valid)
+        return is_valid
     
     # === 序列化方法 ===
-    def to_dict(self, include_content=True, include_relations=False, exclude_fields=None):
+    def to_dict(self, include_content=None, include_relations=False, exclude_fields=None):
         """
         将版本模型转换为字典
         
         Args:
-            include_content (bool): 是否包含内容字段
+            include_content (bool): 是否包含内容字段；None表示内容已加载时才包含，
+                列表序列化不会为延迟加载的内容逐行查询
             include_relations (bool): 是否包含关联数据
             exclude_fields (list): 需要排除的字段列表
             
         Returns:
             dict: 版本数据字典
         """
+        if include_content is None:
+            include_content = 'content' not in inspect(self).unloaded
+        
+        # 关联数据来自其他对象，不随本版本失效，只缓存不含关联的结果
+        cache_key = (include_content, tuple(sorted(exclude_fields or ())))
+        cache = self._dict_cache if not include_relations else None
+        if cache is not None and cache_key in cache:
+            result = copy.copy(cache[cache_key])
+            result['test_count'] = self.get_test_count()
+            return result
+        
         if exclude_fields is None:
             exclude_fields = []
         
@@ -344,9 +486,17 @@ class PromptVersion(BaseModel):
                 )
         
         # 添加计算字段
-        result['test_count'] = self.get_test_count()
-        result['is_valid'] = self.validate_content_hash()
+        # 校验哈希需要读取内容，不包含内容时跳过，避免触发延迟加载
+        result['is_valid'] = self.validate_content_hash() if include_content else None
         
+        # 尚未持久化的版本id和时间戳还会变化，不缓存
+        if self.id is not None and not include_relations:
+            if cache is None:
+                cache = self._dict_cache = {}
+            cache[cache_key] = result
+        
+        result = copy.copy(result)
+        result['test_count'] = self.get_test_count()
         return result
     
     def __repr__(self):
@@ -354,3 +504,51 @@ class PromptVersion(BaseModel):
         return (f"<PromptVersion(id={self.id}, prompt_id={self.prompt_id}, "
                 f"version_number={self.version_number}, is_current={self.is_current})>")
 
+
+@event.listens_for(PromptVersion, 'refresh')
+@event.listens_for(PromptVersion, 'expire')
+def _clear_dict_cache(target, *args):
+    """
+    版本属性重新加载或过期时清除to_dict缓存
+    
+    批量UPDATE后提交会使实例过期，重新加载的字段值可能已经变化。
+    """
+    target._dict_cache = None
+
+
+@event.listens_for(PromptVersion.is_current, 'set')
+def _clear_dict_cache_on_current(target, value, oldvalue, initiator):
+    """
+    is_current被修改时清除to_dict缓存
+    """
+    target._dict_cache = None
+
+
+@event.listens_for(PromptVersion, 'before_insert')
+def _fill_ancestry_path(mapper, connection, target):
+    """
+    插入版本前生成祖先路径
+    
+    父版本已加载时直接使用其路径，否则按parent_version_id查询父版本的路径。
+    """
+    if target.ancestry_path is not None:
+        return
+    
+    parent_id = target.parent_version_id
+    if parent_id is None:
+        target.ancestry_path = '/'
+        return
+    
+    parent = target.__dict__.get('parent_version')
+    if parent is not None and parent.ancestry_path is not None:
+        parent_path = parent.ancestry_path
+    else:
+        parent_path = connection.scalar(
+            select(PromptVersion.ancestry_path).where(PromptVersion.id == parent_id)
+        )
+    
+    # 父版本缺少路径（早于该字段创建）或路径超出列长度时保持为空，相关方法会退回逐级查找
+    if parent_path is not None:
+        path = f'{parent_path}{parent_id}/'
+        if len(path) <= PromptVersion.ancestry_path.type.length:
+            target.ancestry_path = path
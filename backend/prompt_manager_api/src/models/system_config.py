@@ -5,9 +5,56 @@
 用于存储系统级别的配置信息，支持动态配置管理。
 """
 
+import json
+import time
 from sqlalchemy import Column, String, Text, Boolean
 from src.models.base import BaseModel
 
+# 进程内配置值缓存：config_key -> (过期时间, 解析后的值)
+_CACHE = {}
+# 缓存有效期（秒），其他进程修改配置后最多延迟这么久生效
+_CACHE_TTL = 30.0
+# 缓存中表示配置不存在的标记
+_MISSING = object()
+
+# 布尔配置中视为真的取值
+_TRUE = frozenset(('true', '1', 'yes', 'on'))
+
+
+def _parse_boolean(value):
+    """解析布尔配置"""
+    return value.lower() in _TRUE
+
+
+def _parse_number(value):
+    """解析数值配置，含小数点时返回float，解析失败返回0"""
+    try:
+        return float(value) if '.' in value else int(value)
+    except ValueError:
+        return 0
+
+
+def _parse_json(value):
+    """解析JSON配置，解析失败返回空字典"""
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return {}
+
+
+def _parse_string(value):
+    """字符串配置原样返回"""
+    return value
+
+
+# 配置类型到解析函数的映射，未知类型按字符串处理
+_PARSERS = {
+    'boolean': _parse_boolean,
+    'number': _parse_number,
+    'json': _parse_json,
+    'string': _parse_string
+}
+
 
 class SystemConfig(BaseModel):
     """
@@ -61,34 +108,46 @@ class SystemConfig(BaseModel):
         Returns:
             配置值的正确类型
         """
-        if self.config_type == 'boolean':
-            return self.config_value.lower() in ('true', '1', 'yes', 'on')
-        elif self.config_type == 'number':
-            try:
-                if '.' in self.config_value:
-                    return float(self.config_value)
-                else:
-                    return int(self.config_value)
-            except ValueError:
-                return 0
-        elif self.config_type == 'json':
-            import json
-            try:
-                return json.loads(self.config_value)
-            except json.JSONDecodeError:
-                return {}
-        else:  # string
-            return self.config_value
+        return _PARSERS.get(self.config_type, _parse_string)(self.config_value)
+    
+    @classmethod
+    def get_cached(cls, session, key, default=None):
+        """
+        读取配置值，优先使用进程内缓存
+        
+        配置很少变化，缓存命中时不访问数据库；
+        不存在的配置同样缓存，避免反复查询。
+        
+        Args:
+            session: 数据库会话
+            key (str): 配置键
+            default: 配置不存在时返回的默认值
+            
+        Returns:
+            配置值的正确类型
+        """
+        now = time.monotonic()
+        entry = _CACHE.get(key)
+        if entry is not None and entry[0] > now:
+            value = entry[1]
+        else:
+            config = session.query(cls).filter_by(config_key=key).first()
+            value = config.get_value() if config is not None else _MISSING
+            _CACHE[key] = (now + _CACHE_TTL, value)
+        
+        return default if value is _MISSING else value
     
     def set_value(self, value):
         """
         设置配置值
         
+        同时清除该配置的缓存。
+        
         Args:
             value: 要设置的值
         """
+        _CACHE.pop(self.config_key, None)
         if self.config_type == 'json':
-            import json
             self.config_value = json.dumps(value, ensure_ascii=False)
         else:
             self.config_value = str(value)
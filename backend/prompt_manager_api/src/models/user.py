@@ -5,10 +5,70 @@
 用户是系统的核心实体，承载了身份认证、个人信息等功能。
 """
 
-from sqlalchemy import Column, String, Text, Integer, Boolean, JSON
-from sqlalchemy.orm import relationship
-from werkzeug.security import generate_password_hash, check_password_hash
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import Column, String, Text, SmallInteger, Boolean, JSON, DateTime, CheckConstraint, Index, select, func, text
+from sqlalchemy.ext.hybrid import hybrid_method
+from sqlalchemy.orm import relationship, object_session
+from sqlalchemy.orm.attributes import flag_modified
 from src.models.base import BaseModel
+from src.models.prompt import Prompt
+from src.models.prompt_collaborator import PromptCollaborator
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError, InvalidHashError
+except ImportError:  # argon2-cffi为可选依赖，未安装时新密码使用werkzeug的pbkdf2
+    PasswordHasher = None
+
+# 进程内共享的argon2哈希器，参数只解析一次
+_PASSWORD_HASHER = PasswordHasher(
+    time_cost=2, memory_cost=19456, parallelism=1
+) if PasswordHasher is not None else None
+
+# argon2哈希值的前缀，用于区分新旧哈希格式
+_ARGON2_PREFIX = '$argon2'
+
+# 密码哈希线程池；argon2和hashlib计算时释放GIL，哈希可以与请求线程的数据库往返并行
+_hash_pool = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1,
+    thread_name_prefix='password-hash'
+)
+
+
+def hash_password(password):
+    """
+    计算密码哈希
+    
+    安装了argon2-cffi时使用argon2id，否则使用werkzeug的安全哈希算法。
+    
+    Args:
+        password (str): 明文密码
+    
+    Returns:
+        str: 密码哈希值
+    """
+    if _PASSWORD_HASHER is not None:
+        return _PASSWORD_HASHER.hash(password)
+    
+    # 只有注册、改密等路径才需要哈希函数，在此处导入
+    from werkzeug.security import generate_password_hash
+    
+    return generate_password_hash(password)
+
+
+def submit_password_hash(password):
+    """
+    在后台线程中计算密码哈希
+    
+    Args:
+        password (str): 明文密码
+    
+    Returns:
+        Future: 结果为密码哈希值
+    """
+    return _hash_pool.submit(hash_password, password)
 
 
 class User(BaseModel):
@@ -28,6 +88,20 @@ class User(BaseModel):
     # 表名显式指定，体现清晰的命名
     __tablename__ = 'users'
     
+    __table_args__ = (
+        CheckConstraint('status IN (-1, 0, 1)', name='ck_users_status'),
+        # 用户列表按状态过滤、按创建时间倒序；PostgreSQL上附带列表常用列，可走仅索引扫描
+        Index(
+            'ix_users_status_created',
+            'status',
+            'created_at',
+            postgresql_include=['username', 'email', 'display_name']
+        ),
+        # 用户名和邮箱不区分大小写唯一，按lower()查询时走这两个索引
+        Index('uq_users_username_lower', text('lower(username)'), unique=True),
+        Index('uq_users_email_lower', text('lower(email)'), unique=True),
+    )
+    
     # === 认证相关字段 ===
     username = Column(
         String(50),
@@ -76,7 +150,7 @@ class User(BaseModel):
     )
     
     status = Column(
-        Integer,
+        SmallInteger,
         nullable=False,
         default=1,
         comment='用户状态：1-正常，0-禁用，-1-软删除'
@@ -84,6 +158,7 @@ class User(BaseModel):
     
     last_login_at = Column(
         'last_login_at',
+        DateTime,
         nullable=True,
         comment='最后登录时间'
     )
@@ -127,29 +202,58 @@ class User(BaseModel):
         """
         设置用户密码
         
-        使用werkzeug的安全哈希算法加密密码。
+        安装了argon2-cffi时使用argon2id，否则使用werkzeug的安全哈希算法。
         这个方法确保密码以安全的方式存储。
         
         Args:
             password (str): 明文密码
         """
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """
         验证用户密码
         
         将输入的明文密码与存储的哈希值进行比较。
+        旧的werkzeug哈希或参数过时的argon2哈希在验证成功后重新哈希，
+        随调用方的下一次提交写回数据库。
         
         Args:
             password (str): 待验证的明文密码
             
         Returns:
             bool: 密码是否正确
+            
+        Raises:
+            RuntimeError: 存储的是argon2哈希但未安装argon2-cffi时抛出
         """
-        return check_password_hash(self.password_hash, password)
+        if self.password_hash.startswith(_ARGON2_PREFIX):
+            # 不能按密码错误处理，否则已迁移到argon2的用户会被静默锁在系统外
+            if _PASSWORD_HASHER is None:
+                raise RuntimeError("argon2-cffi未安装，无法验证argon2密码哈希")
+            
+            try:
+                _PASSWORD_HASHER.verify(self.password_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False
+            
+            if _PASSWORD_HASHER.check_needs_rehash(self.password_hash):
+                self.password_hash = _PASSWORD_HASHER.hash(password)
+            return True
+        
+        from werkzeug.security import check_password_hash
+        
+        if not check_password_hash(self.password_hash, password):
+            return False
+        
+        # 旧格式哈希验证通过，迁移到argon2
+        if _PASSWORD_HASHER is not None:
+            self.password_hash = _PASSWORD_HASHER.hash(password)
+        return True
     
     # === 状态相关方法 ===
+    # 判断方法可直接用于查询条件，如 query.filter(User.is_active())
+    @hybrid_method
     def is_active(self):
         """
         检查用户是否处于活跃状态
@@ -159,6 +263,7 @@ class User(BaseModel):
         """
         return self.status == 1
     
+    @hybrid_method
     def is_deleted(self):
         """
         检查用户是否已被软删除
@@ -207,10 +312,9 @@ class User(BaseModel):
         if self.preferences is None:
             self.preferences = {}
         
-        # 创建新的字典以触发SQLAlchemy的变更检测
-        new_preferences = dict(self.preferences)
-        new_preferences[key] = value
-        self.preferences = new_preferences
+        # 原地修改后显式标记变更，不必复制整个字典来触发变更检测
+        self.preferences[key] = value
+        flag_modified(self, 'preferences')
     
     def remove_preference(self, key):
         """
@@ -222,12 +326,55 @@ class User(BaseModel):
         if self.preferences is None:
             return
         
-        # 创建新的字典以触发SQLAlchemy的变更检测
-        new_preferences = dict(self.preferences)
-        new_preferences.pop(key, None)
-        self.preferences = new_preferences
+        if key in self.preferences:
+            del self.preferences[key]
+            flag_modified(self, 'preferences')
     
     # === 统计相关方法 ===
+    @classmethod
+    def counts_for(cls, session, ids):
+        """
+        批量统计用户的提示词数量和协作数量
+        
+        两个计数都用关联子查询计算，一条SQL返回所有用户的结果；
+        直接外连接两张表会产生笛卡尔积，导致计数翻倍。
+        
+        Args:
+            session: 数据库会话
+            ids: 用户ID集合
+            
+        Returns:
+            dict: 用户ID -> (提示词数量, 协作数量)
+        """
+        ids = list(ids)
+        if not ids:
+            return {}
+        
+        prompt_count = select(func.count(Prompt.id)).where(
+            Prompt.owner_id == cls.id,
+            Prompt.status == 1
+        ).correlate(cls).scalar_subquery()
+        
+        collaboration_count = select(func.count(PromptCollaborator.id)).where(
+            PromptCollaborator.user_id == cls.id,
+            PromptCollaborator.status == 1
+        ).correlate(cls).scalar_subquery()
+        
+        stmt = select(cls.id, prompt_count, collaboration_count).where(cls.id.in_(ids))
+        return {row[0]: (row[1], row[2]) for row in session.execute(stmt)}
+    
+    def _get_counts(self):
+        """
+        获取当前用户的统计数量
+        
+        Returns:
+            tuple: (提示词数量, 协作数量)
+        """
+        session = object_session(self)
+        if session is None or self.id is None:
+            return 0, 0
+        return self.counts_for(session, (self.id,)).get(self.id, (0, 0))
+    
     def get_prompt_count(self):
         """
         获取用户拥有的提示词数量
@@ -247,7 +394,7 @@ class User(BaseModel):
         return self.collaborated_prompts.filter_by(status=1).count()
     
     # === 序列化方法 ===
-    def to_dict(self, include_sensitive=False, exclude_fields=None):
+    def to_dict(self, include_sensitive=False, exclude_fields=None, counts=None):
         """
         将用户模型转换为字典
         
@@ -256,6 +403,7 @@ class User(BaseModel):
         Args:
             include_sensitive (bool): 是否包含敏感信息（如密码哈希）
             exclude_fields (list): 需要排除的字段列表
+            counts (tuple): counts_for预先查询的(提示词数量, 协作数量)，为None时单独查询
             
         Returns:
             dict: 用户数据字典
@@ -270,8 +418,9 @@ class User(BaseModel):
         result = super().to_dict(exclude_fields=exclude_fields)
         
         # 添加计算字段
-        result['prompt_count'] = self.get_prompt_count()
-        result['collaboration_count'] = self.get_collaboration_count()
+        if counts is None:
+            counts = self._get_counts()
+        result['prompt_count'], result['collaboration_count'] = counts
         result['is_active'] = self.is_active()
         
         return result
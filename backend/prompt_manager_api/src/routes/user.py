@@ -5,11 +5,14 @@
 这个模块体现了RESTful API设计的艺术。
 """
 
-from flask import Blueprint, request, jsonify
-from werkzeug.exceptions import BadRequest
+import json
+
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context, g
+from werkzeug.exceptions import BadRequest, UnsupportedMediaType
 
 from src.services.user_service import UserService, ServiceException
 from src.config.logger import get_logger
+from src.config.rate_limit import login_key, is_login_blocked, record_login_failure, reset_login_failures
 
 # 创建用户蓝图
 user_bp = Blueprint('user', __name__)
@@ -18,6 +21,72 @@ user_bp = Blueprint('user', __name__)
 user_service = UserService()
 logger = get_logger('api.user')
 
+# 用户列表响应允许客户端缓存的时间（秒）
+_LIST_MAX_AGE = 30
+
+# 请求体尚未解析的标记
+_UNPARSED = object()
+
+
+def _error_body(code, message):
+    """
+    序列化固定内容的错误响应体
+    
+    Args:
+        code (str): 错误码
+        message (str): 错误信息
+        
+    Returns:
+        bytes: UTF-8编码的JSON
+    """
+    return json.dumps(
+        {'success': False, 'error': code, 'message': message},
+        ensure_ascii=False,
+        separators=(',', ':')
+    ).encode('utf-8')
+
+
+# 固定内容的错误响应体，模块加载时序列化一次
+_ERR_INTERNAL = _error_body('INTERNAL_ERROR', '服务器内部错误')
+_ERR_INVALID_CREDENTIALS = _error_body('INVALID_CREDENTIALS', '用户名/邮箱或密码错误')
+_ERR_RATE_LIMITED = _error_body('RATE_LIMITED', '登录失败次数过多，请稍后再试')
+_ERR_UNSUPPORTED_MEDIA_TYPE = _error_body('UNSUPPORTED_MEDIA_TYPE', '请求体必须是application/json')
+
+
+def _parse_json():
+    """
+    解析请求体JSON
+    
+    非空请求体必须声明JSON的Content-Type：跨域的text/plain等简单请求不会触发CORS预检，
+    不能当作JSON接受。原始字节直接交给应用的JSON提供者（安装orjson时为orjson）解析，
+    不先解码为字符串。
+    解析结果保存在g中，同一请求内（如装饰器和视图函数）重复调用不会再次解析。
+    
+    Returns:
+        解析得到的对象，请求体为空时返回None
+        
+    Raises:
+        UnsupportedMediaType: 请求体不是JSON类型
+        BadRequest: 请求体不是合法的JSON
+    """
+    data = g.get('_parsed_json', _UNPARSED)
+    if data is not _UNPARSED:
+        return data
+    
+    raw = request.get_data(cache=True)
+    if not raw:
+        data = None
+    elif not request.is_json:
+        raise UnsupportedMediaType()
+    else:
+        try:
+            data = current_app.json.loads(raw)
+        except ValueError:
+            raise BadRequest("无效的JSON请求体")
+    
+    g._parsed_json = data
+    return data
+
 
 @user_bp.route('/', methods=['GET'])
 def list_users():
@@ -27,12 +96,22 @@ def list_users():
     支持分页和过滤参数：
     - page: 页码（默认1）
     - per_page: 每页数量（默认20）
+    - cursor: 游标分页，传入上一页返回的next_cursor；传空值查询第一页。
+      提供此参数时忽略page，也不返回总数
+    - include_total: 是否返回总数（默认true），无限滚动等场景传false可省去计数
+    - fields: 逗号分隔的字段列表，如 id,username,email。
+      提供此参数时只查询这些列，不返回计算字段和总数
     - status: 用户状态过滤
+    
+    响应带由响应内容生成的ETag，请求头If-None-Match匹配时返回不带响应体的304。
     """
     try:
         # 获取查询参数
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        cursor = request.args.get('cursor')
+        fields = request.args.get('fields')
+        include_total = request.args.get('include_total', 'true').lower() not in ('0', 'false', 'no')
         status = request.args.get('status', type=int)
         
         # 构建过滤条件
@@ -41,22 +120,42 @@ def list_users():
             filters['status'] = status
         
         # 查询用户列表
-        result = user_service.list(
-            page=page,
-            per_page=per_page,
-            filters=filters,
-            order_by='-created_at'
-        )
-        
-        # 过滤敏感信息
-        for item in result['items']:
-            item.pop('password_hash', None)
+        if fields:
+            result = user_service.list_projection(
+                columns=[name.strip() for name in fields.split(',') if name.strip()],
+                page=page,
+                per_page=per_page,
+                filters=filters,
+                order_by='-created_at'
+            )
+        elif cursor is not None:
+            result = user_service.cursor_list(
+                cursor=cursor,
+                per_page=per_page,
+                filters=filters,
+                order_by='-created_at'
+            )
+        else:
+            result = user_service.list(
+                page=page,
+                per_page=per_page,
+                filters=filters,
+                order_by='-created_at',
+                include_total=include_total
+            )
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'data': result
         })
         
+        # ETag由响应内容计算，包含其他表的统计字段，数据变化时一定随之变化；
+        # 列表含邮箱等个人信息，只允许浏览器缓存，不允许共享代理缓存
+        response.add_etag()
+        response.cache_control.private = True
+        response.cache_control.max_age = _LIST_MAX_AGE
+        return response.make_conditional(request)
+        
     except ServiceException as e:
         logger.error(f"获取用户列表失败: {e.message}")
         return jsonify({
@@ -67,11 +166,68 @@ def list_users():
     
     except Exception as e:
         logger.error(f"获取用户列表异常: {str(e)}")
+        return Response(_ERR_INTERNAL, status=500, mimetype='application/json')
+
+
+@user_bp.route('/export', methods=['GET'])
+def export_users():
+    """
+    导出用户列表
+    
+    以NDJSON格式（每行一个JSON对象）流式返回全部用户，
+    服务端按批读取和序列化，不把全部用户加载到内存。
+    
+    支持过滤参数：
+    - status: 用户状态过滤
+    
+    导出中途失败时，最后一行为 {"success": false, "error": "EXPORT_FAILED", ...}。
+    """
+    status = request.args.get('status', type=int)
+    filters = {'status': status} if status is not None else None
+    dumps = current_app.json.dumps
+    
+    def generate():
+        try:
+            for item in user_service.stream_list(filters=filters, order_by='id'):
+                yield dumps(item) + '\n'
+        except Exception as e:
+            # 响应头已经发出，输出一条错误记录作为最后一行，客户端据此判断导出不完整
+            logger.error(f"导出用户列表异常: {str(e)}")
+            yield dumps({
+                'success': False,
+                'error': 'EXPORT_FAILED',
+                'message': '导出中断，数据不完整'
+            }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@user_bp.route('/<int:user_id>', methods=['GET'])
+def get_user(user_id):
+    """
+    获取用户资料
+    
+    启用Redis时读取缓存的用户资料，资料修改时缓存自动失效。
+    """
+    try:
+        user_data = user_service.get_profile(user_id)
+        
+        return jsonify({
+            'success': True,
+            'data': user_data
+        })
+        
+    except ServiceException as e:
+        status = 404 if e.code == 'RECORD_NOT_FOUND' else 400
         return jsonify({
             'success': False,
-            'error': 'INTERNAL_ERROR',
-            'message': '服务器内部错误'
-        }), 500
+            'error': e.code,
+            'message': e.message
+        }), status
+    
+    except Exception as e:
+        logger.error(f"获取用户资料异常: {str(e)}")
+        return Response(_ERR_INTERNAL, status=500, mimetype='application/json')
 
 
 @user_bp.route('/', methods=['POST'])
@@ -87,22 +243,31 @@ def create_user():
     """
     try:
         # 获取请求数据
-        data = request.get_json()
+        data = _parse_json()
         if not data:
             raise BadRequest("请求体不能为空")
         
+        if not isinstance(data, dict):
+            raise BadRequest("请求体必须是JSON对象")
+        
         # 验证必需字段
         required_fields = ['username', 'email', 'password']
         for field in required_fields:
             if not data.get(field):
                 raise BadRequest(f"缺少必需字段: {field}")
+            if not isinstance(data[field], str):
+                raise BadRequest(f"字段类型错误: {field}")
+        
+        display_name = data.get('display_name')
+        if display_name is not None and not isinstance(display_name, str):
+            raise BadRequest("字段类型错误: display_name")
         
         # 注册用户
         user = user_service.register(
             username=data['username'],
             email=data['email'],
             password=data['password'],
-            display_name=data.get('display_name')
+            display_name=display_name
         )
         
         # 返回用户信息（不包含敏感数据）
@@ -114,6 +279,9 @@ def create_user():
             'message': '用户注册成功'
         }), 201
         
+    except UnsupportedMediaType:
+        return Response(_ERR_UNSUPPORTED_MEDIA_TYPE, status=415, mimetype='application/json')
+    
     except BadRequest as e:
         return jsonify({
             'success': False,
@@ -131,11 +299,7 @@ def create_user():
     
     except Exception as e:
         logger.error(f"用户注册异常: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': 'INTERNAL_ERROR',
-            'message': '服务器内部错误'
-        }), 500
+        return Response(_ERR_INTERNAL, status=500, mimetype='application/json')
 
 
 @user_bp.route('/login', methods=['POST'])
@@ -146,27 +310,40 @@ def login():
     请求体参数：
     - username_or_email: 用户名或邮箱（必需）
     - password: 密码（必需）
+    
+    同一IP对同一账号连续登录失败达到上限后返回429，锁定期内不再查询数据库和验证密码。
     """
     try:
-        data = request.get_json()
+        data = _parse_json()
         if not data:
             raise BadRequest("请求体不能为空")
         
+        if not isinstance(data, dict):
+            raise BadRequest("请求体必须是JSON对象")
+        
         username_or_email = data.get('username_or_email')
         password = data.get('password')
         
         if not username_or_email or not password:
             raise BadRequest("用户名/邮箱和密码不能为空")
         
+        # 限流键和查询都按字符串处理，其他类型直接拒绝
+        if not isinstance(username_or_email, str) or not isinstance(password, str):
+            raise BadRequest("用户名/邮箱和密码必须是字符串")
+        
+        # 失败次数超限时直接拒绝
+        rate_key = login_key(request.remote_addr, username_or_email)
+        if is_login_blocked(rate_key):
+            return Response(_ERR_RATE_LIMITED, status=429, mimetype='application/json')
+        
         # 用户登录
         user = user_service.login(username_or_email, password)
         
         if not user:
-            return jsonify({
-                'success': False,
-                'error': 'INVALID_CREDENTIALS',
-                'message': '用户名/邮箱或密码错误'
-            }), 401
+            record_login_failure(rate_key)
+            return Response(_ERR_INVALID_CREDENTIALS, status=401, mimetype='application/json')
+        
+        reset_login_failures(rate_key)
         
         # 返回用户信息（实际项目中应该返回JWT token）
         user_data = user.to_dict(exclude_fields=['password_hash'])
@@ -177,6 +354,9 @@ def login():
             'message': '登录成功'
         })
         
+    except UnsupportedMediaType:
+        return Response(_ERR_UNSUPPORTED_MEDIA_TYPE, status=415, mimetype='application/json')
+    
     except BadRequest as e:
         return jsonify({
             'success': False,
@@ -193,9 +373,5 @@ def login():
     
     except Exception as e:
         logger.error(f"用户登录异常: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': 'INTERNAL_ERROR',
-            'message': '服务器内部错误'
-        }), 500
+        return Response(_ERR_INTERNAL, status=500, mimetype='application/json')
 
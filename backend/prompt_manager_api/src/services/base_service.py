@@ -5,15 +5,39 @@
 这个类体现了服务层设计的艺术：抽象、复用、优雅。
 """
 
-from typing import Type, List, Optional, Dict, Any
+import base64
+import binascii
+import json
+import operator
+from datetime import datetime
+from functools import cached_property
+from typing import Type, List, Optional, Dict, Any, Tuple, Iterator
+from sqlalchemy import DateTime, Text, and_, or_, func, insert, inspect, literal, select, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.hybrid import HybridExtensionType
 from sqlalchemy.orm import Query
 
 from src.config.database import db
-from src.config.logger import get_logger, log_database_operation, log_user_action
+from src.config.json_provider import raw_json
+from src.config.logger import (
+    get_logger, log_database_operation, log_user_action,
+    db_logging_enabled, log_payloads_enabled
+)
 from src.models.base import BaseModel
 
 
+# 复杂过滤条件的操作符，如 {'gt': 10}, {'like': '%test%'}
+_OPS = {
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'like': lambda column, value: column.like(value),
+    'in': lambda column, value: column.in_(value)
+}
+
+
 class ServiceException(Exception):
     """
     业务服务异常类
@@ -28,6 +52,52 @@ class ServiceException(Exception):
         super().__init__(self.message)
 
 
+def _encode_cursor(field: str, value: Any, record_id: int) -> str:
+    """
+    将最后一条记录的排序值编码为分页游标
+    
+    Args:
+        field: 排序字段
+        value: 最后一条记录的排序字段值
+        record_id: 最后一条记录的ID，排序值相同时用于区分先后
+        
+    Returns:
+        str: URL安全的base64游标
+    """
+    payload = {'f': field, 'id': record_id}
+    if isinstance(value, datetime):
+        payload['dt'] = value.isoformat()
+    else:
+        payload['v'] = value
+    
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, Any, int]:
+    """
+    解析分页游标
+    
+    Args:
+        cursor: _encode_cursor生成的游标
+        
+    Returns:
+        tuple: (排序字段, 排序值, 记录ID)
+        
+    Raises:
+        ServiceException: 游标格式无效
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if 'dt' in payload:
+            value = datetime.fromisoformat(payload['dt'])
+        else:
+            value = payload['v']
+        return payload['f'], value, int(payload['id'])
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ServiceException("无效的分页游标", 'INVALID_CURSOR')
+
+
 class BaseService:
     """
     基础服务类
@@ -42,6 +112,9 @@ class BaseService:
     - 异常处理：统一的错误处理机制
     """
     
+    # 不允许通过投影查询返回的列，子类按需覆盖
+    hidden_fields = frozenset()
+    
     def __init__(self, model_class: Type[BaseModel]):
         """
         初始化基础服务
@@ -77,10 +150,12 @@ class BaseService:
             db.session.add(instance)
             db.session.commit()
             
-            # 记录日志
-            log_database_operation('CREATE', self.table_name, instance.id, data)
+            # 记录日志，默认只记录字段名
+            details = data if log_payloads_enabled() else {'fields': list(data)}
+            if db_logging_enabled():
+                log_database_operation('CREATE', self.table_name, instance.id, details)
             if user_id:
-                log_user_action(user_id, 'CREATE', self.table_name, instance.id, data)
+                log_user_action(user_id, 'CREATE', self.table_name, instance.id, details)
             
             self.logger.info(f"创建{self.table_name}记录成功: ID={instance.id}")
             return instance
@@ -103,7 +178,7 @@ class BaseService:
         try:
             instance = self.model_class.query.get(record_id)
             
-            if instance:
+            if instance and db_logging_enabled():
                 log_database_operation('READ', self.table_name, record_id)
             
             return instance
@@ -148,8 +223,9 @@ class BaseService:
         try:
             instance = self.get_by_id_or_404(record_id)
             
-            # 记录更新前的数据
-            old_data = instance.to_dict()
+            # 只有需要记录数据内容时才序列化更新前的数据
+            log_payloads = log_payloads_enabled()
+            old_data = instance.to_dict() if log_payloads else None
             
             # 更新字段
             instance.update_from_dict(data)
@@ -157,12 +233,16 @@ class BaseService:
             # 保存到数据库
             db.session.commit()
             
-            # 记录日志
-            update_details = {
-                'old_data': old_data,
-                'new_data': data
-            }
-            log_database_operation('UPDATE', self.table_name, record_id, update_details)
+            # 记录日志，默认只记录更新的字段名
+            if log_payloads:
+                update_details = {
+                    'old_data': old_data,
+                    'new_data': data
+                }
+            else:
+                update_details = {'fields': list(data)}
+            if db_logging_enabled():
+                log_database_operation('UPDATE', self.table_name, record_id, update_details)
             if user_id:
                 log_user_action(user_id, 'UPDATE', self.table_name, record_id, update_details)
             
@@ -204,7 +284,8 @@ class BaseService:
             db.session.commit()
             
             # 记录日志
-            log_database_operation(operation, self.table_name, record_id)
+            if db_logging_enabled():
+                log_database_operation(operation, self.table_name, record_id)
             if user_id:
                 log_user_action(user_id, operation, self.table_name, record_id)
             
@@ -217,19 +298,28 @@ class BaseService:
             raise ServiceException(f"删除记录失败: {str(e)}", 'DELETE_FAILED')
     
     def list(self, page: int = 1, per_page: int = 20, filters: Dict = None, 
-             order_by: str = None) -> Dict[str, Any]:
+             order_by: str = None, include_total: bool = True) -> Dict[str, Any]:
         """
         分页查询记录列表
         
+        总数通过窗口函数COUNT(*) OVER()随数据一起取回，不再单独执行COUNT查询；
+        不需要总数时（如无限滚动）多取一条记录判断是否有下一页。
+        
         Args:
             page: 页码
             per_page: 每页数量
             filters: 过滤条件
             order_by: 排序字段
+            include_total: 是否返回总数和总页数
             
         Returns:
             dict: 包含数据和分页信息的字典
         """
+        # 与paginate(error_out=False)一致，非法页码和每页数量使用默认值
+        page = page if page and page > 0 else 1
+        per_page = per_page if per_page and per_page > 0 else 20
+        offset = (page - 1) * per_page
+        
         try:
             query = self.model_class.query
             
@@ -241,34 +331,318 @@ class BaseService:
             if order_by:
                 query = self._apply_ordering(query, order_by)
             
-            # 分页查询
-            pagination = query.paginate(
-                page=page,
-                per_page=per_page,
-                error_out=False
-            )
+            if include_total:
+                rows = query.add_columns(
+                    func.count().over().label('_total')
+                ).limit(per_page).offset(offset).all()
+                items = [row[0] for row in rows]
+                
+                if rows:
+                    total = rows[0][1]
+                elif page > 1:
+                    # 页码超出范围时窗口函数没有返回行，单独统计一次
+                    total = query.order_by(None).count()
+                else:
+                    total = 0
+                
+                pages = (total + per_page - 1) // per_page
+                has_next = page < pages
+            else:
+                items = query.limit(per_page + 1).offset(offset).all()
+                has_next = len(items) > per_page
+                items = items[:per_page]
+                total = None
+                pages = None
             
             # 记录日志
-            log_database_operation('LIST', self.table_name, None, {
+            if db_logging_enabled():
+                log_database_operation('LIST', self.table_name, None, {
+                    'page': page,
+                    'per_page': per_page,
+                    'total': total
+                })
+            
+            result = {
+                'items': self._serialize_items(items),
                 'page': page,
                 'per_page': per_page,
-                'total': pagination.total
-            })
+                'has_prev': page > 1,
+                'has_next': has_next
+            }
+            if include_total:
+                result['total'] = total
+                result['pages'] = pages
+            return result
+            
+        except SQLAlchemyError as e:
+            self.logger.error(f"查询{self.table_name}列表失败: {str(e)}")
+            raise ServiceException(f"查询列表失败: {str(e)}", 'LIST_FAILED')
+    
+    def cursor_list(self, cursor: str = None, per_page: int = 20, filters: Dict = None,
+                    order_by: str = '-created_at') -> Dict[str, Any]:
+        """
+        游标分页查询记录列表
+        
+        按 (排序字段, id) 做键集分页：下一页的条件是排在上一页最后一条记录之后，
+        无论翻到多深都只是一次索引定位，不像OFFSET那样扫描并丢弃前面的所有行。
+        也不统计总数。
+        
+        Args:
+            cursor: 上一页返回的next_cursor，为空时查询第一页
+            per_page: 每页数量
+            filters: 过滤条件
+            order_by: 排序字段，支持 'field' 或 '-field' (降序)
+            
+        Returns:
+            dict: 包含数据和下一页游标的字典
+        """
+        # 与list一致，非法的每页数量使用默认值
+        per_page = per_page if per_page and per_page > 0 else 20
+        
+        # 只允许按列或hybrid_property排序，方法、关系等其他属性回退为按id排序
+        descending = order_by.startswith('-')
+        field = order_by.lstrip('-')
+        column = self._column_map.get(field)
+        if column is None:
+            field = 'id'
+            column = self.model_class.id
+        
+        id_column = self.model_class.id
+        
+        try:
+            query = self.model_class.query
+            
+            if filters:
+                query = self._apply_filters(query, filters)
+            
+            if cursor:
+                cursor_field, value, last_id = _decode_cursor(cursor)
+                if cursor_field != field:
+                    raise ServiceException("分页游标与排序字段不匹配", 'INVALID_CURSOR')
+                
+                if field == 'id':
+                    after = id_column < last_id if descending else id_column > last_id
+                elif descending:
+                    after = or_(column < value, and_(column == value, id_column < last_id))
+                else:
+                    after = or_(column > value, and_(column == value, id_column > last_id))
+                query = query.filter(after)
+            
+            if descending:
+                query = query.order_by(column.desc(), id_column.desc())
+            else:
+                query = query.order_by(column.asc(), id_column.asc())
+            
+            # 多取一条判断是否还有下一页
+            items = query.limit(per_page + 1).all()
+            has_next = len(items) > per_page
+            items = items[:per_page]
+            
+            next_cursor = None
+            if has_next:
+                last = items[-1]
+                next_cursor = _encode_cursor(field, getattr(last, field), last.id)
+            
+            return {
+                'items': self._serialize_items(items),
+                'per_page': per_page,
+                'has_next': has_next,
+                'next_cursor': next_cursor
+            }
+            
+        except SQLAlchemyError as e:
+            self.logger.error(f"查询{self.table_name}列表失败: {str(e)}")
+            raise ServiceException(f"查询列表失败: {str(e)}", 'LIST_FAILED')
+    
+    def list_projection(self, columns: List[str], page: int = 1, per_page: int = 20,
+                        filters: Dict = None, order_by: str = None) -> Dict[str, Any]:
+        """
+        只查询指定列的分页列表
+        
+        直接返回行数据组成的字典，不构建ORM实例，也不经过to_dict；
+        适合只需要少量基础字段的列表接口。不统计总数。
+        PostgreSQL上由数据库用json_agg直接生成items的JSON文本，见_list_projection_json。
+        
+        Args:
+            columns: 需要返回的列名列表
+            page: 页码
+            per_page: 每页数量
+            filters: 过滤条件
+            order_by: 排序字段
+            
+        Returns:
+            dict: 包含数据和分页信息的字典
+            
+        Raises:
+            ServiceException: 列名无效或不允许返回时抛出
+        """
+        table_columns = self.model_class.__table__.columns
+        invalid = [name for name in columns
+                   if name not in table_columns or name in self.hidden_fields]
+        if not columns or invalid:
+            raise ServiceException(f"无效的字段: {', '.join(invalid)}", 'INVALID_FIELDS')
+        
+        page = page if page and page > 0 else 1
+        per_page = per_page if per_page and per_page > 0 else 20
+        
+        # datetime列统一转换为ISO格式，与to_dict的输出保持一致
+        datetime_fields = [name for name in columns
+                           if isinstance(table_columns[name].type, DateTime)]
+        
+        try:
+            if db.session.get_bind().dialect.name == 'postgresql':
+                return self._list_projection_json(columns, page, per_page, filters, order_by)
+            
+            query = db.session.query(*[getattr(self.model_class, name) for name in columns])
+            
+            if filters:
+                query = self._apply_filters(query, filters)
+            
+            if order_by:
+                query = self._apply_ordering(query, order_by)
+            
+            rows = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+            has_next = len(rows) > per_page
+            
+            items = []
+            for row in rows[:per_page]:
+                item = row._asdict()
+                for name in datetime_fields:
+                    value = item[name]
+                    if value is not None:
+                        item[name] = value.isoformat()
+                items.append(item)
             
             return {
-                'items': [item.to_dict() for item in pagination.items],
-                'total': pagination.total,
+                'items': items,
                 'page': page,
                 'per_page': per_page,
-                'pages': pagination.pages,
-                'has_prev': pagination.has_prev,
-                'has_next': pagination.has_next
+                'has_prev': page > 1,
+                'has_next': has_next
             }
             
         except SQLAlchemyError as e:
             self.logger.error(f"查询{self.table_name}列表失败: {str(e)}")
             raise ServiceException(f"查询列表失败: {str(e)}", 'LIST_FAILED')
     
+    def _list_projection_json(self, columns: List[str], page: int, per_page: int,
+                              filters: Dict = None, order_by: str = None) -> Dict[str, Any]:
+        """
+        在PostgreSQL中分页查询并聚合为JSON
+        
+        一条语句完成分页、投影和序列化，返回一行JSON文本，Python侧不逐行处理；
+        多取的一行只参与has_next判断，不进入items。
+        
+        Args:
+            columns: 已校验的列名列表
+            page: 页码
+            per_page: 每页数量
+            filters: 过滤条件
+            order_by: 排序字段
+            
+        Returns:
+            dict: 与list_projection相同结构的字典，items为预序列化的JSON
+        """
+        offset = (page - 1) * per_page
+        order_clause = self._order_clause(order_by) if order_by else None
+        
+        # 行号与外层排序一致，在OFFSET之前编号
+        row_number = func.row_number().over(order_by=order_clause).label('_rn')
+        inner = select(*[getattr(self.model_class, name) for name in columns], row_number)
+        if filters:
+            inner = self._apply_filters(inner, filters)
+        if order_clause is not None:
+            inner = inner.order_by(order_clause)
+        inner = inner.limit(per_page + 1).offset(offset).subquery()
+        
+        row_json = func.json_build_object(
+            *[part for name in columns for part in (literal(name), inner.c[name])]
+        )
+        items_json = func.coalesce(
+            func.json_agg(aggregate_order_by(row_json, inner.c._rn)).filter(
+                inner.c._rn <= offset + per_page
+            ),
+            text("'[]'::json")
+        )
+        
+        payload, fetched = db.session.execute(
+            select(items_json.cast(Text), func.count())
+        ).one()
+        
+        return {
+            'items': raw_json(payload),
+            'page': page,
+            'per_page': per_page,
+            'has_prev': page > 1,
+            'has_next': fetched > per_page
+        }
+    
+    def stream_list(self, filters: Dict = None, order_by: str = None,
+                    chunk: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        流式遍历全部记录
+        
+        按键集分页（cursor_list）逐批读取，每批序列化后即可释放，
+        内存占用与批大小相关，与总行数无关。用于导出等全量读取场景。
+        每批结果完整取回后才序列化，子类在_serialize_items中的批量预取查询
+        不会与未读完的游标共用连接（MySQL的非缓冲游标不允许这样做）。
+        
+        Args:
+            filters: 过滤条件
+            order_by: 排序字段，默认按id
+            chunk: 每批读取的行数
+            
+        Yields:
+            dict: 逐条记录的数据字典
+            
+        Raises:
+            ServiceException: 查询失败时抛出
+        """
+        cursor = None
+        while True:
+            page = self.cursor_list(
+                cursor=cursor,
+                per_page=chunk,
+                filters=filters,
+                order_by=order_by or 'id'
+            )
+            yield from page['items']
+            
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
+    
+    def _serialize_items(self, items: List[BaseModel]) -> List[Dict[str, Any]]:
+        """
+        序列化列表查询结果
+        
+        子类可重写此方法，批量预取关联数据后再逐条序列化。
+        
+        Args:
+            items: 模型实例列表
+            
+        Returns:
+            list: 字典列表
+        """
+        return [item.to_dict() for item in items]
+    
+    @cached_property
+    def _column_map(self) -> Dict[str, Any]:
+        """
+        可用于过滤和排序的字段名到类属性的映射
+        
+        包括映射列和hybrid_property，首次使用时从模型映射解析一次。
+        
+        Returns:
+            dict: 字段名 -> 可用于SQL表达式的类属性
+        """
+        mapper = inspect(self.model_class)
+        column_map = {attr.key: getattr(self.model_class, attr.key) for attr in mapper.column_attrs}
+        for key, descriptor in mapper.all_orm_descriptors.items():
+            if descriptor.extension_type is HybridExtensionType.HYBRID_PROPERTY:
+                column_map[key] = getattr(self.model_class, key)
+        return column_map
+    
     def _apply_filters(self, query: Query, filters: Dict) -> Query:
         """
         应用过滤条件
@@ -280,29 +654,23 @@ class BaseService:
         Returns:
             Query: 应用过滤条件后的查询对象
         """
+        column_map = self._column_map
+        
         for field, value in filters.items():
-            if hasattr(self.model_class, field):
-                column = getattr(self.model_class, field)
-                
-                # 处理不同类型的过滤条件
-                if isinstance(value, dict):
-                    # 复杂过滤条件，如 {'gt': 10}, {'like': '%test%'}
-                    for op, op_value in value.items():
-                        if op == 'gt':
-                            query = query.filter(column > op_value)
-                        elif op == 'gte':
-                            query = query.filter(column >= op_value)
-                        elif op == 'lt':
-                            query = query.filter(column < op_value)
-                        elif op == 'lte':
-                            query = query.filter(column <= op_value)
-                        elif op == 'like':
-                            query = query.filter(column.like(op_value))
-                        elif op == 'in':
-                            query = query.filter(column.in_(op_value))
-                else:
-                    # 简单等值过滤
-                    query = query.filter(column == value)
+            column = column_map.get(field)
+            if column is None:
+                continue
+            
+            # 处理不同类型的过滤条件
+            if isinstance(value, dict):
+                # 复杂过滤条件，未知的操作符忽略
+                for op, op_value in value.items():
+                    op_fn = _OPS.get(op)
+                    if op_fn is not None:
+                        query = query.filter(op_fn(column, op_value))
+            else:
+                # 简单等值过滤
+                query = query.filter(column == value)
         
         return query
     
@@ -317,20 +685,28 @@ class BaseService:
         Returns:
             Query: 应用排序后的查询对象
         """
-        if order_by.startswith('-'):
-            # 降序
-            field = order_by[1:]
-            if hasattr(self.model_class, field):
-                column = getattr(self.model_class, field)
-                query = query.order_by(column.desc())
-        else:
-            # 升序
-            if hasattr(self.model_class, order_by):
-                column = getattr(self.model_class, order_by)
-                query = query.order_by(column.asc())
+        clause = self._order_clause(order_by)
+        if clause is not None:
+            query = query.order_by(clause)
         
         return query
     
+    def _order_clause(self, order_by: str):
+        """
+        把排序字段解析为排序表达式
+        
+        Args:
+            order_by: 排序字段，支持 'field' 或 '-field' (降序)
+            
+        Returns:
+            排序表达式，字段无效时返回None
+        """
+        descending = order_by.startswith('-')
+        column = self._column_map.get(order_by[1:] if descending else order_by)
+        if column is None:
+            return None
+        return column.desc() if descending else column.asc()
+    
     # === 事务管理 ===
     
     def execute_in_transaction(self, func, *args, **kwargs):
@@ -359,30 +735,62 @@ class BaseService:
     
     # === 批量操作 ===
     
-    def bulk_create(self, data_list: List[Dict], user_id: int = None) -> List[BaseModel]:
+    @cached_property
+    def _needs_orm_insert(self) -> bool:
+        """
+        模型是否依赖逐个实例写入时才会执行的逻辑
+        
+        有@validates校验器或插入相关的映射器事件时，批量INSERT会跳过这些逻辑。
+        
+        Returns:
+            bool: 需要逐个构造实例写入时返回True
+        """
+        mapper = inspect(self.model_class)
+        dispatch = mapper.dispatch
+        return bool(mapper.validators or dispatch.before_insert or dispatch.after_insert)
+    
+    def bulk_create(self, data_list: List[Dict], user_id: int = None,
+                    use_orm: Optional[bool] = None) -> List[BaseModel]:
         """
         批量创建记录
         
+        数据库支持executemany RETURNING（如PostgreSQL、SQLite）且模型没有校验器和插入事件时，
+        使用批量INSERT ... RETURNING，一条语句写入所有记录并取回实例，不逐个经过工作单元；
+        列的default仍然生效，但不会调用模型的__init__。
+        其他情况（如MySQL）逐个构造实例后提交。
+        
         Args:
             data_list: 创建数据列表
             user_id: 操作用户ID
+            use_orm: 是否逐个构造模型实例写入，None表示根据模型和数据库自动选择
             
         Returns:
             List[BaseModel]: 创建的模型实例列表
         """
+        if not data_list:
+            return []
+        
+        if use_orm is None:
+            use_orm = (self._needs_orm_insert or
+                       not db.session.get_bind().dialect.insert_executemany_returning)
+        
         try:
-            instances = []
-            for data in data_list:
-                instance = self.model_class(**data)
-                instances.append(instance)
-                db.session.add(instance)
+            if use_orm:
+                instances = [self.model_class(**data) for data in data_list]
+                db.session.add_all(instances)
+            else:
+                instances = db.session.scalars(
+                    insert(self.model_class).returning(self.model_class),
+                    data_list
+                ).all()
             
             db.session.commit()
             
             # 记录日志
-            log_database_operation('BULK_CREATE', self.table_name, None, {
-                'count': len(instances)
-            })
+            if db_logging_enabled():
+                log_database_operation('BULK_CREATE', self.table_name, None, {
+                    'count': len(instances)
+                })
             if user_id:
                 log_user_action(user_id, 'BULK_CREATE', self.table_name, None, {
                     'count': len(instances)
@@ -5,12 +5,16 @@
 这个服务体现了用户管理的完整业务逻辑。
 """
 
-from typing import Optional, Dict, Any
+import json
+from typing import Optional, Dict, Any, List
+from sqlalchemy import select, or_, func
+from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.security import check_password_hash
 
-from src.models.user import User
+from src.models.user import User, submit_password_hash
 from src.services.base_service import BaseService, ServiceException
-from src.config.logger import get_logger
+from src.config.cache import get_redis, CACHE_ERRORS
+from src.config.logger import get_logger, log_database_operation, db_logging_enabled, log_payloads_enabled
 
 
 class UserService(BaseService):
@@ -21,10 +25,109 @@ class UserService(BaseService):
     设计理念：安全第一、用户体验优先、扩展性考虑。
     """
     
+    # 投影查询不允许返回密码哈希
+    hidden_fields = frozenset(('password_hash',))
+    
     def __init__(self):
         super().__init__(User)
         self.logger = get_logger('service.user')
     
+    def _serialize_items(self, items: List[User]) -> List[Dict[str, Any]]:
+        """
+        序列化用户列表
+        
+        一次查询取出本页所有用户的统计数量，避免每个用户单独查询两次。
+        
+        Args:
+            items: 用户实例列表
+            
+        Returns:
+            list: 用户字典列表
+        """
+        from src.config.database import db
+        counts = User.counts_for(db.session, [user.id for user in items])
+        return [user.to_dict(counts=counts.get(user.id, (0, 0))) for user in items]
+    
+    # === 用户资料缓存 ===
+    
+    @staticmethod
+    def _profile_cache_key(user_id: int) -> str:
+        """用户资料在Redis中的键"""
+        return f'user:{user_id}'
+    
+    def get_profile(self, user_id: int) -> Dict[str, Any]:
+        """
+        获取用户资料（序列化后的字典）
+        
+        启用Redis时先读缓存，未命中再查询数据库并写入缓存。
+        缓存只保存用户表自身的字段，提示词数量和协作数量来自其他表，每次读取时单独查询。
+        需要修改用户的流程应使用get_by_id_or_404取得会话中的实例。
+        
+        Args:
+            user_id: 用户ID
+            
+        Returns:
+            dict: 用户数据字典，不含密码哈希
+            
+        Raises:
+            ServiceException: 用户不存在时抛出
+        """
+        from src.config.database import db
+        
+        client = get_redis()
+        key = self._profile_cache_key(user_id)
+        
+        if client is not None:
+            try:
+                raw = client.get(key)
+                if raw:
+                    data = json.loads(raw)
+                    counts = User.counts_for(db.session, (user_id,)).get(user_id, (0, 0))
+                    data['prompt_count'], data['collaboration_count'] = counts
+                    return data
+            except CACHE_ERRORS as e:
+                self.logger.warning("读取用户缓存失败: %s", e)
+        
+        data = self.get_by_id_or_404(user_id).to_dict()
+        
+        if client is not None:
+            from src.config import config
+            cached = {k: v for k, v in data.items() if k not in ('prompt_count', 'collaboration_count')}
+            try:
+                client.setex(key, config.USER_CACHE_TTL, json.dumps(cached, ensure_ascii=False))
+            except CACHE_ERRORS as e:
+                self.logger.warning("写入用户缓存失败: %s", e)
+        
+        return data
+    
+    def _invalidate_profile(self, user_id: int) -> None:
+        """
+        使用户资料缓存失效
+        
+        Args:
+            user_id: 用户ID
+        """
+        client = get_redis()
+        if client is None:
+            return
+        
+        try:
+            client.delete(self._profile_cache_key(user_id))
+        except CACHE_ERRORS as e:
+            self.logger.warning("清除用户缓存失败: %s", e)
+    
+    def update(self, record_id: int, data: Dict[str, Any], user_id: int = None) -> User:
+        """更新用户并清除资料缓存"""
+        user = super().update(record_id, data, user_id)
+        self._invalidate_profile(record_id)
+        return user
+    
+    def delete(self, record_id: int, user_id: int = None, soft_delete: bool = True) -> bool:
+        """删除用户并清除资料缓存"""
+        result = super().delete(record_id, user_id, soft_delete)
+        self._invalidate_profile(record_id)
+        return result
+    
     def register(self, username: str, email: str, password: str, 
                 display_name: str = None) -> User:
         """
@@ -42,16 +145,30 @@ class UserService(BaseService):
         Raises:
             ServiceException: 注册失败时抛出
         """
-        # 验证用户名和邮箱是否已存在
-        if self.get_by_username(username):
-            raise ServiceException("用户名已存在", 'USERNAME_EXISTS')
-        
-        if self.get_by_email(email):
-            raise ServiceException("邮箱已存在", 'EMAIL_EXISTS')
-        
         # 验证密码强度
         self._validate_password(password)
         
+        # 密码哈希在后台线程中计算，与下面的唯一性查询并行
+        hash_future = submit_password_hash(password)
+        
+        # 验证用户名和邮箱是否已存在（不区分大小写），一次查询同时检查两者
+        from src.config.database import db
+        username_lower = username.lower()
+        existing = db.session.execute(
+            select(User.username, User.email).where(
+                or_(
+                    func.lower(User.username) == username_lower,
+                    func.lower(User.email) == email.lower()
+                )
+            )
+        ).all()
+        
+        if existing:
+            hash_future.cancel()
+            if any(row.username.lower() == username_lower for row in existing):
+                raise ServiceException("用户名已存在", 'USERNAME_EXISTS')
+            raise ServiceException("邮箱已存在", 'EMAIL_EXISTS')
+        
         # 创建用户数据
         user_data = {
             'username': username,
@@ -60,16 +177,21 @@ class UserService(BaseService):
             'status': 1  # 正常状态
         }
         
-        # 创建用户
-        user = self.create(user_data)
-        
-        # 设置密码（单独处理以确保加密）
-        user.set_password(password)
-        
-        # 保存密码
-        from src.config.database import db
-        db.session.commit()
-        
+        # 在内存中构建用户并设置密码，一次提交写入，不会出现没有密码哈希的用户
+        user = User(**user_data)
+        user.password_hash = hash_future.result()
+        
+        try:
+            db.session.add(user)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            self.logger.error(f"创建{self.table_name}记录失败: {str(e)}")
+            raise ServiceException(f"创建记录失败: {str(e)}", 'CREATE_FAILED')
+        
+        if db_logging_enabled():
+            details = user_data if log_payloads_enabled() else {'fields': list(user_data)}
+            log_database_operation('CREATE', self.table_name, user.id, details)
         self.logger.info(f"用户注册成功: {username} ({email})")
         return user
     
@@ -101,19 +223,28 @@ class UserService(BaseService):
             self.logger.warning(f"登录失败: 密码错误 - {username_or_email}")
             return None
         
-        # 更新最后登录时间
-        from datetime import datetime
-        user.last_login_at = datetime.utcnow()
-        
+        # 更新最后登录时间，间隔内的重复登录不写库
+        from datetime import datetime, timedelta
+        from src.config import config
         from src.config.database import db
-        db.session.commit()
+        
+        now = datetime.utcnow()
+        last_login_at = user.last_login_at
+        if (last_login_at is None or
+                now - last_login_at >= timedelta(minutes=config.LAST_LOGIN_UPDATE_MINUTES)):
+            user.last_login_at = now
+        
+        # 密码哈希升级（check_password中的rehash）同样需要提交
+        if user in db.session.dirty:
+            db.session.commit()
+            self._invalidate_profile(user.id)
         
         self.logger.info(f"用户登录成功: {user.username}")
         return user
     
     def get_by_username(self, username: str) -> Optional[User]:
         """
-        根据用户名获取用户
+        根据用户名获取用户，不区分大小写
         
         Args:
             username: 用户名
@@ -121,11 +252,11 @@ class UserService(BaseService):
         Returns:
             User: 用户实例，如果不存在则返回None
         """
-        return User.query.filter_by(username=username).first()
+        return User.query.filter(func.lower(User.username) == username.lower()).first()
     
     def get_by_email(self, email: str) -> Optional[User]:
         """
-        根据邮箱获取用户
+        根据邮箱获取用户，不区分大小写
         
         Args:
             email: 邮箱
@@ -133,11 +264,13 @@ class UserService(BaseService):
         Returns:
             User: 用户实例，如果不存在则返回None
         """
-        return User.query.filter_by(email=email).first()
+        return User.query.filter(func.lower(User.email) == email.lower()).first()
     
     def get_by_username_or_email(self, username_or_email: str) -> Optional[User]:
         """
-        根据用户名或邮箱获取用户
+        根据用户名或邮箱获取用户，不区分大小写
+        
+        一次查询同时匹配用户名和邮箱；两者分别命中不同用户时优先返回用户名匹配的用户。
         
         Args:
             username_or_email: 用户名或邮箱
@@ -145,10 +278,15 @@ class UserService(BaseService):
         Returns:
             User: 用户实例，如果不存在则返回None
         """
-        user = self.get_by_username(username_or_email)
-        if not user:
-            user = self.get_by_email(username_or_email)
-        return user
+        value = username_or_email.lower()
+        users = User.query.filter(
+            or_(func.lower(User.username) == value, func.lower(User.email) == value)
+        ).limit(2).all()
+        
+        for user in users:
+            if user.username.lower() == value:
+                return user
+        return users[0] if users else None
     
     def change_password(self, user_id: int, old_password: str, new_password: str) -> bool:
         """
@@ -165,17 +303,21 @@ class UserService(BaseService):
         Raises:
             ServiceException: 修改失败时抛出
         """
+        # 验证新密码强度
+        self._validate_password(new_password)
+        
+        # 新密码的哈希在后台线程中计算，与旧密码验证并行
+        hash_future = submit_password_hash(new_password)
+        
         user = self.get_by_id_or_404(user_id)
         
         # 验证旧密码
         if not user.check_password(old_password):
+            hash_future.cancel()
             raise ServiceException("旧密码错误", 'INVALID_OLD_PASSWORD')
         
-        # 验证新密码强度
-        self._validate_password(new_password)
-        
         # 设置新密码
-        user.set_password(new_password)
+        user.password_hash = hash_future.result()
         
         from src.config.database import db
         db.session.commit()
@@ -219,6 +361,7 @@ class UserService(BaseService):
         
         from src.config.database import db
         db.session.commit()
+        self._invalidate_profile(user_id)
         
         self.logger.info(f"用户更新偏好设置成功: {user.username}")
         return user
@@ -284,6 +427,7 @@ class UserService(BaseService):
         
         from src.config.database import db
         db.session.commit()
+        self._invalidate_profile(user_id)
         
         from src.config.logger import log_user_action
         log_user_action(operator_id, 'DEACTIVATE', 'user', user_id)
@@ -307,6 +451,7 @@ class UserService(BaseService):
         
         from src.config.database import db
         db.session.commit()
+        self._invalidate_profile(user_id)
         
         from src.config.logger import log_user_action
         log_user_action(operator_id, 'ACTIVATE', 'user', user_id)